@@ -0,0 +1,192 @@
+import datetime
+import json
+from flask import Blueprint, Response, abort, current_app, request
+from models import db, Venue, Artist, Show, VenueGenre, ArtistGenre
+from queries import (
+    paginate,
+    decode_cursor,
+    venue_detail,
+    artist_detail,
+    venue_validators,
+    artist_validators,
+    upcoming_shows,
+    SHOW_KEY
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON read API.
+#
+# Versioned, read-only JSON views over the same query layer as the HTML
+# pages. Every endpoint takes fields= (comma-separated) to return only some
+# fields; listings are keyset-paginated like the HTML listings and take
+# include=shows to embed each entity's shows, loaded for the whole page in
+# one extra query.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_FIELDS = (
+    'id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link', 'website_link', 'facebook_link',
+    'seeking_talent', 'seeking_description', 'upcoming_shows_count', 'past_shows_count'
+)
+ARTIST_FIELDS = (
+    'id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'website_link', 'facebook_link',
+    'seeking_venue', 'seeking_description', 'available_hours', 'upcoming_shows_count', 'past_shows_count'
+)
+SHOW_FIELDS = ('venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time')
+DETAIL_SHOW_FIELDS = ('past_shows', 'upcoming_shows')
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError('Cannot serialize ' + type(value).__name__)
+
+def to_json(payload, status=200):
+    """
+    Returns payload as a JSON response, encoded with orjson when it is
+    installed and the standard library otherwise
+    """
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, default=_json_default, separators=(',', ':'))
+    return Response(body, status=status, mimetype='application/json')
+
+def requested_fields(allowed):
+    """
+    Returns the fields named by the fields= argument, or all of allowed when
+    it is absent. Aborts with a 400 naming any unknown field
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return list(allowed)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        abort(to_json({'error': 'Unknown fields: ' + ', '.join(unknown)}, 400))
+    return fields
+
+def includes(name):
+    return name in request.args.get('include', '').split(',')
+
+def _page_args(key_types):
+    cursors = {}
+    for direction in ('after', 'before'):
+        cursor = request.args.get(direction)
+        try:
+            cursors[direction] = decode_cursor(cursor, key_types) if cursor else None
+        except ValueError:
+            abort(to_json({'error': 'Invalid cursor'}, 400))
+    per_page = request.args.get('per_page', current_app.config['LISTING_PAGE_SIZE'], type=int)
+    cursors['per_page'] = max(1, min(per_page, current_app.config['API_MAX_PAGE_SIZE']))
+    return cursors
+
+def _listing(page, data):
+    return to_json({
+        'data': data,
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    })
+
+def _entity_listing(model, genre_model, genre_fk, show_fk, counterpart, counterpart_fk, prefix, allowed):
+    fields = requested_fields(allowed)
+    columns = [getattr(model, field) for field in fields if field not in ('id', 'genres')]
+    query = db.session.query(model.id, *columns)
+    genres = request.args.getlist('genre')
+    if genres:
+        query = query.filter(model.id.in_(
+            db.session.query(genre_fk).filter(genre_model.genre.in_(genres))
+        ))
+    page = paginate(query, (model.id,), lambda row: (row[0],), **_page_args((int,)))
+
+    records = {}
+    for row in page['items']:
+        record = {'id': row[0]}
+        record.update(zip([column.key for column in columns], row[1:]))
+        records[row[0]] = record
+    ids = list(records)
+
+    if 'genres' in fields:
+        for record in records.values():
+            record['genres'] = []
+        if ids:
+            for entity_id, genre in db.session.query(genre_fk, genre_model.genre).filter(genre_fk.in_(ids)):
+                records[entity_id]['genres'].append(genre)
+
+    if includes('shows'):
+        for record in records.values():
+            record['shows'] = []
+        if ids:
+            shows = db.session.query(
+                show_fk, counterpart_fk, counterpart.name, counterpart.image_link, Show.start_time
+            ).join(
+                counterpart, counterpart.id == counterpart_fk
+            ).filter(
+                show_fk.in_(ids)
+            ).order_by(Show.start_time)
+            for entity_id, counterpart_id, name, image_link, start_time in shows:
+                records[entity_id]['shows'].append({
+                    prefix + '_id': counterpart_id,
+                    prefix + '_name': name,
+                    prefix + '_image_link': image_link,
+                    'start_time': start_time
+                })
+
+    return _listing(page, [{key: record[key] for key in fields + ['shows'] if key in record} for record in records.values()])
+
+def _entity(validators, load, allowed):
+    fields = requested_fields(allowed)
+    data = load(validators[0]) if validators is not None else None
+    if data is None:
+        abort(to_json({'error': 'Not found'}, 404))
+    keys = [field for field in fields if field in data]
+    if includes('shows'):
+        keys += DETAIL_SHOW_FIELDS
+    return to_json({key: data[key] for key in keys})
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+def venues():
+    return _entity_listing(
+        Venue, VenueGenre, VenueGenre.venue_id, Show.venue_id, Artist, Show.artist_id, 'artist', VENUE_FIELDS
+    )
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    cache = current_app.extensions['entity_cache']
+    past_limit = current_app.config.get('PAST_SHOWS_LIMIT')
+    return _entity(
+        venue_validators(venue_id),
+        lambda tag: cache.venue(venue_id, tag, lambda: venue_detail(venue_id, past_limit=past_limit)),
+        VENUE_FIELDS
+    )
+
+@api.route('/artists')
+def artists():
+    return _entity_listing(
+        Artist, ArtistGenre, ArtistGenre.artist_id, Show.artist_id, Venue, Show.venue_id, 'venue', ARTIST_FIELDS
+    )
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    cache = current_app.extensions['entity_cache']
+    past_limit = current_app.config.get('PAST_SHOWS_LIMIT')
+    return _entity(
+        artist_validators(artist_id),
+        lambda tag: cache.artist(artist_id, tag, lambda: artist_detail(artist_id, past_limit=past_limit)),
+        ARTIST_FIELDS
+    )
+
+@api.route('/shows')
+def shows():
+    fields = requested_fields(SHOW_FIELDS)
+    page = upcoming_shows(**_page_args(SHOW_KEY))
+    return _listing(page, [{field: show[field] for field in fields} for show in page['items']])
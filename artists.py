@@ -0,0 +1,217 @@
+import datetime
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from models import db, Artist
+import search
+from views import page_args, conditional, stream_page
+from queries import artists_page, artist_detail, available_artists, artist_venue_ids, artist_validators, ARTIST_KEY
+
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('artists', __name__)
+
+@blueprint.route('/artists')
+def artists():
+  """
+  GET request for all Artists in the database, optionally filtered to the
+  genres given as repeated ?genre= arguments
+  """
+  page = artists_page(genres=request.args.getlist('genre'), **page_args(ARTIST_KEY))
+
+  return stream_page('pages/artists.html', artists=page['items'], page=page)
+
+@blueprint.route('/artists/search', methods=['POST'])
+def search_artists():
+  """
+    Returns Artists matching a given POST search string
+  """
+
+  artists = search.search_artists(request.form.get('search_term', ''), limit=current_app.config['SEARCH_RESULTS_LIMIT'])
+
+  count = 0
+  match_array = []
+  for artist in artists:
+    count += 1
+    match_array.append({
+      "id": artist.id,
+      "name": artist.name,
+      "num_upcoming_shows": artist.upcoming_shows_count
+    })
+  response = {
+    "count": count,
+    "data": match_array
+  }
+
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@blueprint.route('/artists/available')
+def show_available_artists():
+  """
+    Returns the artists who can start a show at the ISO 8601 datetime at= and
+    are not booked for duration= minutes (two hours by default) from then,
+    optionally limited to the genres given with genre=
+  """
+  try:
+    at = datetime.datetime.fromisoformat(request.args['at'])
+    duration = datetime.timedelta(minutes=int(request.args.get('duration', 120)))
+  except (KeyError, ValueError):
+    abort(400)
+  if duration <= datetime.timedelta(0):
+    abort(400)
+
+  artists = available_artists(
+    at, duration, genres=request.args.getlist('genre'), limit=current_app.config['SEARCH_RESULTS_LIMIT']
+  )
+  response = {
+    "count": len(artists),
+    "data": [{
+      "id": artist.id,
+      "name": artist.name,
+      "num_upcoming_shows": artist.upcoming_shows_count
+    } for artist in artists]
+  }
+
+  return render_template('pages/available_artists.html', results=response, at=at)
+
+@blueprint.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+  """
+  Returns a page showing the database details for the given artist,
+  where the artist ID is supplied as a GET request parameter
+  """
+
+  validators = artist_validators(artist_id)
+  if validators is None:
+    abort(404)
+
+  def render():
+    cache = current_app.extensions['entity_cache']
+    # Tagged with the ETag so the body sent always matches it
+    data = cache.artist(artist_id, validators[0], lambda: artist_detail(artist_id, past_limit=current_app.config.get('PAST_SHOWS_LIMIT')))
+    if data is None:
+      abort(404)
+    return render_template('pages/show_artist.html', artist=data)
+
+  return conditional(validators, render)
+
+#  Update
+#  ----------------------------------------------------------------
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  """
+  Deliver a page showing the database details of the artist given as a GET parameter id.
+  Allows users to edit and submit changes
+  """
+  from forms import ArtistForm
+  artist = Artist.query.get(artist_id)
+  form = ArtistForm(obj=artist)
+
+  form.genres.data = artist.genres
+
+  # TODO: populate form with fields from artist with ID <artist_id>
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  """
+  Receives data from the edit artist page and stores changes in the database.
+  Artist ID is provided as a GET parameter and the form data is POSTed
+  """
+  from forms import ArtistForm
+
+  form = ArtistForm()
+  #if form.validate_on_submit():
+  name = form.name.data
+  city = form.city.data
+  state = form.state.data
+  phone = form.phone.data
+  genres = form.genres.data
+  website_link = form.website_link.data
+  facebook_link = form.facebook_link.data
+  image_link = form.image_link.data
+
+  try:
+    artist = Artist.query.get(artist_id)
+    artist.name = name
+    artist.city = city
+    artist.state = state
+    artist.phone = phone
+    artist.genres = genres
+    artist.website_link = website_link
+    artist.facebook_link = facebook_link
+    artist.image_link = image_link
+    db.session.flush()
+    search.index_artist(artist_id)
+
+    db.session.commit()
+    # The artist's name and image also appear on its venues' pages
+    current_app.extensions['entity_cache'].invalidate(venue_ids=artist_venue_ids(artist_id), artist_ids=[artist_id])
+    flash('Artist ' + form.name.data + ' was successfully updated!')
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+  except Exception as e:
+    db.session.rollback()
+    flash('ERROR: Artist not updated')
+  finally:
+    db.session.close()
+
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  """
+  Create a new artist in the database, the artist details are POSTed
+  """
+  from forms import ArtistForm
+  form = ArtistForm()
+  if form.validate():
+    name = form.name.data
+    city = form.city.data
+    state = form.state.data
+    phone = form.phone.data
+    image_link = form.image_link.data
+    genres = form.genres.data
+    website_link = form.website_link.data
+    facebook_link = form.facebook_link.data
+    date_added = datetime.datetime.utcnow()
+    available_hours = form.available_hours.data
+
+    try:
+      artist = Artist(name=name, city=city, state=state, phone=phone, image_link=image_link, genres=genres, website_link=website_link, facebook_link=facebook_link, date_added=date_added, available_hours=available_hours)
+      db.session.add(artist)
+      db.session.flush()
+      artist_id = artist.id
+      search.index_artist(artist_id)
+      db.session.commit()
+      # SQLite may hand out the ID of a deleted artist again
+      current_app.extensions['entity_cache'].invalidate(artist_ids=[artist_id])
+      flash('Artist ' + form.name.data + ' was successfully listed!')
+      # TODO: insert form data as a new Venue record in the db, instead
+      # TODO: modify data to be the data object returned from db insertion
+    except Exception as e:
+      db.session.rollback()
+      flash('ERROR: Artist not added, there was an error writing to the database: ' + str(e))
+      return render_template('forms/new_artist.html', form=form)
+    finally:
+      db.session.close()
+  else:
+    flash('ERROR: Artist not added, please check errors below:')
+    return render_template('forms/new_artist.html', form=form)
+
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  return redirect(url_for('index'))
@@ -0,0 +1,284 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import time
+import click
+from flask import abort, current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+# The stylesheets and scripts of layouts/main.html are bundled into one file
+# per BUNDLES entry, minified, and written under static/dist with a hash of
+# their content in the name, next to .gz (and, with the brotli package, .br)
+# copies. static/dist/manifest.json maps bundle names to those files and
+# static_url() in templates looks them up, so a changed bundle gets a new
+# URL and the old one can be cached for good. 'flask assets build' writes
+# them at deploy time; ASSETS_AUTO_BUILD rebuilds them at startup, and in
+# debug mode on the next page view, whenever a source is newer.
+#----------------------------------------------------------------------------#
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# bundle name: source files under static/, in order
+BUNDLES = {
+    'app.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css'
+    ],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'app.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+    'jquery.js': ['js/libs/jquery-1.11.1.min.js'],
+    'respond.js': ['js/libs/respond-1.4.2.min.js']
+}
+
+# Compressed copies are only written, and served, for files at least this big
+COMPRESS_MIN_SIZE = 512
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.S)
+_CSS_URL = re.compile(r'url\(\s*(["\']?)([^"\')]+)\1\s*\)')
+
+def _minify_css_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+    return code.replace(';}', '}')
+
+def minify_css(text):
+    """
+    Returns text without comments and the whitespace CSS does not need;
+    strings are left as they are
+    """
+    parts = []
+    position = 0
+    for match in _CSS_TOKENS.finditer(text):
+        parts.append(_minify_css_code(text[position:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))
+        position = match.end()
+    parts.append(_minify_css_code(text[position:]))
+    return ''.join(parts).strip()
+
+def _rebase_css_urls(text, source, target):
+    # Relative url()s point from the source's folder; the bundle is elsewhere
+    def rebase(match):
+        quote, url = match.groups()
+        if re.match(r'^(?:[a-z]+:|/|#)', url):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return 'url(%s%s%s)' % (quote, posixpath.relpath(path, posixpath.dirname(target)), quote)
+    return _CSS_URL.sub(rebase, text)
+
+def bundle(static_folder, name, sources):
+    """
+    Returns the minified contents of the sources of bundle name, as bytes
+    """
+    target = posixpath.join(DIST, name)
+    texts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            text = minify_css(_rebase_css_urls(text, source, target))
+        elif rjsmin is not None and not source.endswith('.min.js'):
+            text = rjsmin.jsmin(text)
+        texts.append(text.strip())
+    # A script that leaves off its last semicolon must not run into the next
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return (separator.join(texts) + '\n').encode('utf-8')
+
+def _write(path, data):
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    # mkstemp makes the file private; a front-end server may serve it too
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+def build(static_folder, bundles=BUNDLES, compress=True):
+    """
+    Writes every bundle, its compressed copies and the manifest under
+    static_folder/dist, and returns the manifest
+    """
+    directory = os.path.join(static_folder, DIST)
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    for name, sources in bundles.items():
+        data = bundle(static_folder, name, sources)
+        stem, extension = os.path.splitext(name)
+        filename = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], extension)
+        path = os.path.join(directory, filename)
+        # Content-addressed, so an existing file is already up to date
+        if not os.path.exists(path):
+            _write(path, data)
+        if compress and len(data) >= COMPRESS_MIN_SIZE:
+            if not os.path.exists(path + '.gz'):
+                _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None and not os.path.exists(path + '.br'):
+                _write(path + '.br', brotli.compress(data, quality=11))
+        manifest[name] = filename
+    _write(os.path.join(directory, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def prune(static_folder, manifest):
+    """
+    Deletes the built files under static_folder/dist that manifest no
+    longer names, and returns how many there were
+    """
+    directory = os.path.join(static_folder, DIST)
+    keep = {MANIFEST} | {
+        filename + suffix for filename in manifest.values() for suffix in ('', '.gz', '.br')
+    }
+    removed = 0
+    for filename in os.listdir(directory):
+        if filename not in keep:
+            os.remove(os.path.join(directory, filename))
+            removed += 1
+    return removed
+
+def _newest_source(static_folder, bundles):
+    return max(
+        os.path.getmtime(os.path.join(static_folder, source)) for sources in bundles.values() for source in sources
+    )
+
+def load_manifest(static_folder):
+    """
+    Returns the manifest under static_folder/dist, or None when there is
+    none
+    """
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+class Assets:
+    """
+    Serves the built bundles with far-future cache headers, precompressed
+    when the client accepts it, and provides static_url() to templates
+    """
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.static_folder = None
+        self.auto_build = False
+        self.checked = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.auto_build = app.config.get('ASSETS_AUTO_BUILD', False)
+        self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.manifest = self._load(app)
+        app.add_url_rule(
+            app.static_url_path + '/' + DIST + '/<path:filename>', endpoint='assets', view_func=self.send
+        )
+        app.add_template_global(self.static_url)
+        app.cli.add_command(assets_cli)
+        app.extensions['assets'] = self
+
+    def _load(self, app):
+        manifest = load_manifest(self.static_folder)
+        if self.auto_build and (manifest is None or self._stale()):
+            manifest = build(self.static_folder)
+            app.logger.info('Built static asset bundles: %s', ', '.join(sorted(manifest.values())))
+        if manifest is None:
+            # Not fatal here, so 'flask assets build' itself can still start
+            app.logger.error("No static asset manifest; run 'flask assets build' or set ASSETS_AUTO_BUILD")
+            manifest = {}
+        self.checked = time.monotonic()
+        return manifest
+
+    def _stale(self):
+        manifest_path = os.path.join(self.static_folder, DIST, MANIFEST)
+        try:
+            return _newest_source(self.static_folder, BUNDLES) > os.path.getmtime(manifest_path)
+        except FileNotFoundError:
+            return True
+
+    def static_url(self, name):
+        """
+        Returns the URL of bundle name, or of the file static/name when no
+        bundle has that name
+        """
+        # While debugging, pick up edited sources at most once a second
+        if current_app.debug and self.auto_build and time.monotonic() - self.checked > 1:
+            self.manifest = self._load(current_app)
+        filename = self.manifest.get(name)
+        if filename is not None:
+            return url_for('assets', filename=filename)
+        if name in BUNDLES:
+            raise RuntimeError("Static asset bundle %s is not built; run 'flask assets build'" % name)
+        return url_for('static', filename=name)
+
+    def send(self, filename):
+        """
+        Sends a built file with the precompressed copy the client accepts
+        best, marked cacheable for ASSETS_MAX_AGE
+        """
+        if filename == MANIFEST or filename.endswith(('.gz', '.br')):
+            abort(404)
+        directory = os.path.join(self.static_folder, DIST)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = next((
+            encoding for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+            if request.accept_encodings[encoding] and os.path.exists(os.path.join(directory, filename + suffix))
+        ), None)
+        if encoding is None:
+            response = send_from_directory(directory, filename, mimetype=mimetype, max_age=self.max_age)
+        else:
+            suffix = '.br' if encoding == 'br' else '.gz'
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=self.max_age)
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+@assets_cli.command('build')
+@click.option('--prune', 'remove_old', is_flag=True, help='Delete built files the new manifest does not use.')
+def build_command(remove_old):
+    """
+    Bundles, minifies and compresses the static assets into static/dist
+    """
+    static_folder = current_app.static_folder
+    manifest = build(static_folder)
+    assets = current_app.extensions.get('assets')
+    if assets is not None:
+        assets.manifest = manifest
+    for name, filename in sorted(manifest.items()):
+        path = os.path.join(static_folder, DIST, filename)
+        sizes = ['%d bytes' % os.path.getsize(path)]
+        for suffix in ('.gz', '.br'):
+            if os.path.exists(path + suffix):
+                sizes.append('%s %d' % (suffix[1:], os.path.getsize(path + suffix)))
+        click.echo('%-12s %s (%s)' % (name, filename, ', '.join(sizes)))
+    if brotli is None:
+        click.echo('brotli is not installed, so no .br files were written', err=True)
+    if remove_old:
+        click.echo('%d old files removed' % prune(static_folder, manifest))
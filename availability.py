@@ -0,0 +1,89 @@
+import re
+
+#----------------------------------------------------------------------------#
+# Artist availability.
+#
+# Artists give their availability as text: windows separated by ';', each
+# an optional list of days followed by a time range, e.g.
+# "Mon-Fri 18-23; Sat,Sun 12:00-23:30". A window without days applies to
+# every day, and one that ends at or before its start runs past midnight.
+# The text is parsed into (weekday, start minute, end minute) rows, Monday
+# being 0, which is what the database indexes and queries.
+#----------------------------------------------------------------------------#
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MINUTES_PER_DAY = 24 * 60
+
+# An artist who gives no availability can play at any time
+ALWAYS = [(weekday, 0, MINUTES_PER_DAY) for weekday in range(7)]
+
+_WINDOW = re.compile(r'^(?:(?P<days>[a-z,\s-]+?)\s+)?(?P<start>\d{1,2}(?::\d\d)?)\s*-\s*(?P<end>\d{1,2}(?::\d\d)?)$')
+
+def _minute(text):
+    hours, _, minutes = text.partition(':')
+    hours, minutes = int(hours), int(minutes or 0)
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError('Invalid time: ' + text)
+    return hours * 60 + minutes
+
+def _day(text):
+    # A day is its name or a prefix of it of at least three letters
+    text = text.strip()
+    for weekday, name in enumerate(DAYS):
+        if len(text) >= 3 and name.startswith(text):
+            return weekday
+    raise ValueError('Invalid day: ' + text)
+
+def _days(text):
+    if not text:
+        return list(range(7))
+    days = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        first = _day(first)
+        last = _day(last) if last else first
+        days += [(first + offset) % 7 for offset in range((last - first) % 7 + 1)]
+    return days
+
+def parse(text):
+    """
+    Returns the sorted (weekday, start minute, end minute) rows for an
+    availability text, ALWAYS when it is empty. Raises ValueError when the
+    text is not valid
+    """
+    if not text or not text.strip():
+        return list(ALWAYS)
+    rows = {}
+    for window in text.lower().split(';'):
+        if not window.strip():
+            continue
+        match = _WINDOW.match(window.strip())
+        if match is None:
+            raise ValueError('Invalid availability: ' + window.strip())
+        start = _minute(match.group('start'))
+        end = _minute(match.group('end'))
+        if start >= MINUTES_PER_DAY:
+            raise ValueError('Invalid start time: ' + match.group('start'))
+        for weekday in _days(match.group('days')):
+            if start < end:
+                spans = [(weekday, start, end)]
+            else:
+                spans = [(weekday, start, MINUTES_PER_DAY), ((weekday + 1) % 7, 0, end)]
+            for day, span_start, span_end in spans:
+                # Windows starting together on one day merge into the longest
+                if span_end > span_start and span_end > rows.get((day, span_start), 0):
+                    rows[(day, span_start)] = span_end
+    return sorted((day, start, end) for (day, start), end in rows.items())
+
+def minute_of_week(at):
+    """
+    Returns the (weekday, minute of the day) a datetime falls on
+    """
+    return at.weekday(), at.hour * 60 + at.minute
+
+def is_available(windows, at):
+    """
+    Returns whether at falls in one of the (weekday, start, end) windows
+    """
+    weekday, minute = minute_of_week(at)
+    return any(day == weekday and start <= minute < end for day, start, end in windows)
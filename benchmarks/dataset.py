@@ -0,0 +1,207 @@
+"""
+Seeded generator of a synthetic Fyyur database: venues, artists with
+genres and availability, and shows spread over the past and next year.
+
+    python benchmarks/dataset.py [--shows 10000] [--seed 0] [--out PATH]
+
+The database is SQLite (the sqlite profile) and is written to
+benchmarks/data/fyyur-<shows>-<seed>.db unless --out is given. The same
+arguments always produce the same rows, so benchmark runs against it are
+comparable across releases.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('Oakland', 'CA'), ('New York', 'NY'),
+    ('Brooklyn', 'NY'), ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+    ('Portland', 'OR'), ('Denver', 'CO'), ('Nashville', 'TN'), ('New Orleans', 'LA'),
+    ('Atlanta', 'GA'), ('Boston', 'MA'), ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Miami', 'FL')
+]
+ADJECTIVES = [
+    'Blue', 'Golden', 'Velvet', 'Electric', 'Midnight', 'Crimson', 'Silver', 'Wild', 'Lucky', 'Hollow',
+    'Neon', 'Rusty', 'Quiet', 'Broken', 'Little', 'Northern', 'Paper', 'Iron', 'Crystal', 'Lonesome'
+]
+NOUNS = [
+    'Owl', 'Room', 'Lantern', 'Harbor', 'Garden', 'Tavern', 'Echo', 'Fox', 'River', 'Cellar',
+    'Parlor', 'Anchor', 'Saloon', 'Hall', 'Engine', 'Sparrow', 'Mirror', 'Canyon', 'Theater', 'Wolves'
+]
+STREETS = ['Main St', 'Market St', 'Mission St', 'Broadway', 'Elm St', 'Oak Ave', 'Pine St', 'Sunset Blvd']
+AVAILABILITY = [
+    '', '', '18-24', '19-23', 'Mon-Fri 18-23; Sat,Sun 12-24', 'Thu-Sun 20-2', 'Fri,Sat 17-23:30', '12-23'
+]
+SLOTS = (datetime.time(19), datetime.time(22))
+# Shows are spread over DAYS days centred on ANCHOR, which is fixed so the
+# rows do not depend on the day they are generated; see shift_to() for
+# moving them next to today
+ANCHOR = datetime.datetime(2026, 1, 1)
+DAYS = 730
+BATCH_SIZE = 10000
+
+
+def _name(rng, number):
+    # Names are unique, so the number is added once the pairs run out
+    pair = '%s %s' % (ADJECTIVES[number % len(ADJECTIVES)], NOUNS[(number // len(ADJECTIVES)) % len(NOUNS)])
+    cycle = number // (len(ADJECTIVES) * len(NOUNS))
+    return pair if cycle == 0 else '%s %d' % (pair, cycle + 1)
+
+
+def _insert(connection, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def generate(shows, seed=0, now=None):
+    """
+    Fills the empty database of the current app context with shows shows
+    and a proportionate number of venues and artists
+    """
+    from forms import ArtistForm
+    from models import db, sweep_show_counters, Venue, Artist, Show, VenueGenre, ArtistGenre, ArtistAvailability
+    import availability
+    import search
+
+    rng = random.Random(seed)
+    now = now or ANCHOR
+    genres = [value for value, _ in ArtistForm.genres.kwargs['choices']]
+    venue_count = max(10, shows // 40)
+    artist_count = max(20, shows // 15)
+    connection = db.session.connection()
+
+    venues, venue_genres = [], []
+    for venue_id in range(1, venue_count + 1):
+        city, state = rng.choice(CITIES)
+        venues.append({
+            'id': venue_id,
+            'name': 'The ' + _name(rng, venue_id),
+            'city': city,
+            'state': state,
+            'address': '%d %s, Unit %d' % (rng.randrange(1, 9999), rng.choice(STREETS), venue_id),
+            'phone': '%03d-%03d-%04d' % (venue_id // 10000000 % 1000, venue_id // 10000 % 1000, venue_id % 10000),
+            'image_link': 'https://images.example.com/venues/%d.jpg' % venue_id,
+            'website_link': 'https://venue%d.example.com' % venue_id,
+            'facebook_link': 'https://www.facebook.com/venue%d' % venue_id,
+            'seeking_talent': rng.random() < 0.4,
+            'seeking_description': 'Looking for local acts' if rng.random() < 0.4 else None,
+            'date_added': now - datetime.timedelta(days=rng.randrange(1000)),
+            'updated_at': now
+        })
+        venue_genres += [{'venue_id': venue_id, 'genre': genre} for genre in rng.sample(genres, rng.randint(1, 3))]
+    _insert(connection, Venue.__table__, venues)
+    _insert(connection, VenueGenre.__table__, venue_genres)
+
+    artists, artist_genres, windows = [], [], []
+    for artist_id in range(1, artist_count + 1):
+        city, state = rng.choice(CITIES)
+        hours = rng.choice(AVAILABILITY)
+        artists.append({
+            'id': artist_id,
+            'name': _name(rng, artist_id + venue_count),
+            'city': city,
+            'state': state,
+            'phone': '%03d-%03d-%04d' % (500 + artist_id // 10000000 % 500, artist_id // 10000 % 1000, artist_id % 10000),
+            'image_link': 'https://images.example.com/artists/%d.jpg' % artist_id,
+            'website_link': 'https://artist%d.example.com' % artist_id if rng.random() < 0.6 else None,
+            'facebook_link': 'https://www.facebook.com/artist%d' % artist_id,
+            'seeking_venue': rng.random() < 0.5,
+            'seeking_description': None,
+            'date_added': now - datetime.timedelta(days=rng.randrange(1000)),
+            'available_hours': hours or None,
+            'updated_at': now
+        })
+        artist_genres += [{'artist_id': artist_id, 'genre': genre} for genre in rng.sample(genres, rng.randint(1, 2))]
+        windows += [
+            {'artist_id': artist_id, 'weekday': weekday, 'start_minute': start, 'end_minute': end}
+            for weekday, start, end in availability.parse(hours)
+        ]
+    _insert(connection, Artist.__table__, artists)
+    _insert(connection, ArtistGenre.__table__, artist_genres)
+    _insert(connection, ArtistAvailability.__table__, windows)
+
+    # Each show takes its own (venue, day, slot), so venues are never double
+    # booked; a few popular artists play far more often than the rest
+    first_day = now - datetime.timedelta(days=DAYS // 2)
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(artist_count)]
+    artist_ids = rng.choices(range(1, artist_count + 1), weights=weights, k=shows)
+    show_rows = []
+    for artist_id, slot in zip(artist_ids, rng.sample(range(venue_count * DAYS * len(SLOTS)), shows)):
+        venue_index, rest = divmod(slot, DAYS * len(SLOTS))
+        day, slot_index = divmod(rest, len(SLOTS))
+        start = datetime.datetime.combine((first_day + datetime.timedelta(days=day)).date(), SLOTS[slot_index])
+        show_rows.append({
+            'venue_id': venue_index + 1,
+            'artist_id': artist_id,
+            'start_time': start,
+            'end_time': start + datetime.timedelta(minutes=rng.choice((90, 120, 150)))
+        })
+    show_rows.sort(key=lambda row: row['start_time'])
+    _insert(connection, Show.__table__, show_rows)
+
+    sweep_show_counters()
+    search.reindex()
+    db.session.commit()
+    return {'venues': venue_count, 'artists': artist_count, 'shows': shows}
+
+
+def shift_to(today, anchor=ANCHOR):
+    """
+    Moves the shows of a generated database in the current app context by
+    whole weeks, so they centre on today rather than on the anchor they
+    were generated around, and recounts the upcoming and past shows.
+    Whole weeks keep every show on its weekday. Returns the shift
+    """
+    from sqlalchemy import func, update
+    from models import db, sweep_show_counters, Show
+
+    shift = datetime.timedelta(weeks=round((today - anchor).days / 7))
+    if shift:
+        modifier = '%+d days' % shift.days
+        db.session.execute(update(Show).values(
+            start_time=func.datetime(Show.start_time, modifier),
+            end_time=func.datetime(Show.end_time, modifier)
+        ))
+        sweep_show_counters()
+        db.session.commit()
+    return shift
+
+
+def default_path(shows, seed):
+    return os.path.join(HERE, 'data', 'fyyur-%d-%d.db' % (shows, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.out or default_path(args.shows, args.seed))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ['FYYUR_PROFILE'] = 'sqlite'
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+    from app import create_app
+    from models import db
+
+    app = create_app()
+
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        counts = generate(args.shows, args.seed)
+    print('%(venues)d venues, %(artists)d artists, %(shows)d shows' % counts, end=' ')
+    print('written to %s in %.1fs' % (path, time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of the `datetime` template filter against the filter it
+replaced, over the start times of a large /shows page.
+
+    python benchmarks/datetime_filter.py [--shows 2000] [--repeat 5]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import timeit
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from filters import format_datetime, _format_datetime
+
+
+def baseline_format_datetime(value, format='medium'):
+    # The filter as it was: re-parse the string and reformat on every call
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    start = datetime.datetime(2026, 1, 1, 18)
+    times = [start + datetime.timedelta(days=random.randrange(365), hours=random.randrange(6)) for _ in range(args.shows)]
+    strings = [str(value) for value in times]
+
+    for value, string in zip(times[:50], strings[:50]):
+        for format in ('full', 'medium'):
+            assert format_datetime(value, format) == baseline_format_datetime(string, format)
+
+    def cold():
+        _format_datetime.cache_clear()
+        for value in times:
+            format_datetime(value, 'full')
+
+    cases = [
+        ('baseline (str, parse + format)', lambda: [baseline_format_datetime(value, 'full') for value in strings]),
+        ('datetime, cold memo', cold),
+        ('datetime, warm memo', lambda: [format_datetime(value, 'full') for value in times]),
+    ]
+    print('%d show times, best of %d' % (args.shows, args.repeat))
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        print('%-32s %8.2f ms  %6.2f us/show' % (name, best * 1000, best * 1e6 / args.shows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""
+Per-route benchmark: drives every route of app.py through the Flask test
+client against a synthetic SQLite database and reports p50/p95 latency and
+queries per request.
+
+    python benchmarks/routes.py [--shows 10000] [--seed 0] [--requests 50] [--accept-encoding gzip] [--json PATH]
+
+The dataset (see dataset.py) is generated on first use and copied before
+each run, so the write routes never change it, and the copy's shows are
+moved next to today so upcoming shows are upcoming. --json saves the results
+for comparison with later runs. Besides the whole request, the time to the
+first byte of the body and the bytes sent are reported, which streamed and
+compressed pages improve; --accept-encoding sets the header the requests
+send (none by default).
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+from dataset import DAYS, default_path, shift_to
+
+# Routes that stream the whole dataset run this many times at most
+EXPORT_REQUESTS = 5
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def check_flashes(client, name):
+    """
+    Takes the flashed messages out of the client's session and stops the
+    run on anything but a success message, so a write that was refused is
+    not timed as if it worked
+    """
+    with client.session_transaction() as session:
+        messages = [message for _, message in session.pop('_flashes', [])]
+    errors = [message for message in messages if 'successfully' not in message]
+    if errors:
+        raise RuntimeError('%s flashed: %s' % (name, errors[0]))
+
+
+def check_results(body, name):
+    """
+    Stops the run when a batch response reports a row that was not created
+    """
+    data = json.loads(body)
+    for result in data.get('results', []) if isinstance(data, dict) else []:
+        if result['status'] != 'created':
+            raise RuntimeError('%s: line %d %s: %s' % (name, result['line'], result['status'], result['errors']))
+
+
+def cases(venue_ids, artist_ids, windows, genres, rng):
+    """
+    Returns (name, endpoint, request maker) triples; a request maker takes
+    the iteration number and returns test client open() arguments. Show
+    dates are relative to today, so upcoming shows stay upcoming; windows
+    maps artist IDs to their (weekday, start, end) availability
+    """
+    def venue_form(i):
+        return {
+            'name': 'Bench Venue %d' % i, 'city': 'Benchtown', 'state': 'CA',
+            'address': '%d Bench St' % i, 'phone': '999-%03d-%04d' % (i // 10000, i % 10000),
+            'genres': rng.sample(genres, 2), 'website_link': 'https://bench.example.com'
+        }
+
+    def artist_form(i):
+        return {
+            'name': 'Bench Artist %d' % i, 'city': 'Benchtown', 'state': 'CA',
+            'phone': '998-%03d-%04d' % (i // 10000, i % 10000), 'genres': rng.sample(genres, 2),
+            'available_hours': 'Mon-Fri 18-23'
+        }
+
+    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Every new show gets a day of its own after the dataset's shows, so it
+    # cannot clash with another, and a time in its artist's availability
+    show_days = itertools.count(DAYS // 2 + 7)
+
+    def future_show(i):
+        day = today + datetime.timedelta(days=next(show_days))
+        while True:
+            artist_id = rng.choice(artist_ids)
+            spans = [(start, end) for weekday, start, end in windows[artist_id] if weekday == day.weekday()]
+            if spans:
+                break
+        start, end = rng.choice(spans)
+        minute = rng.randrange(start, end, 15) if end - start > 15 else start
+        return {
+            'artist_id': artist_id, 'venue_id': rng.choice(venue_ids),
+            'start_time': (day + datetime.timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M')
+        }
+
+    def future_evening(i):
+        return (today + datetime.timedelta(days=rng.randint(1, 365), hours=20)).strftime('%Y-%m-%dT%H:%M')
+
+    def deleted_venue(i):
+        # Each delete takes a venue out of the pool the other routes pick from
+        return venue_ids.pop(rng.randrange(len(venue_ids)))
+
+    venue = lambda i: rng.choice(venue_ids)
+    artist = lambda i: rng.choice(artist_ids)
+    term = lambda i: rng.choice(['the', 'blue', 'owl', 'room', 'san', 'new york', 'xyzzy'])
+    return [
+        ('/', 'index', lambda i: {'path': '/'}),
+        ('/venues', 'venues.venues', lambda i: {'path': '/venues'}),
+        ('/venues?genre=', 'venues.venues', lambda i: {'path': '/venues', 'query_string': {'genre': rng.choice(genres)}}),
+        ('/venues/<id>', 'venues.show_venue', lambda i: {'path': '/venues/%d' % venue(i)}),
+        ('POST /venues/search', 'venues.search_venues', lambda i: {'path': '/venues/search', 'method': 'POST', 'data': {'search_term': term(i)}}),
+        ('/venues/create', 'venues.create_venue_form', lambda i: {'path': '/venues/create'}),
+        ('POST /venues/create', 'venues.create_venue_submission', lambda i: {'path': '/venues/create', 'method': 'POST', 'data': venue_form(i)}),
+        ('/venues/<id>/edit', 'venues.edit_venue', lambda i: {'path': '/venues/%d/edit' % venue(i)}),
+        ('POST /venues/<id>/edit', 'venues.edit_venue_submission', lambda i: {
+            'path': '/venues/%d/edit' % venue(i), 'method': 'POST', 'data': venue_form(100000 + i)
+        }),
+        ('/artists', 'artists.artists', lambda i: {'path': '/artists'}),
+        ('/artists?genre=', 'artists.artists', lambda i: {'path': '/artists', 'query_string': {'genre': rng.choice(genres)}}),
+        ('/artists/<id>', 'artists.show_artist', lambda i: {'path': '/artists/%d' % artist(i)}),
+        ('/artists/available', 'artists.show_available_artists', lambda i: {
+            'path': '/artists/available', 'query_string': {'at': future_evening(i)}
+        }),
+        ('POST /artists/search', 'artists.search_artists', lambda i: {'path': '/artists/search', 'method': 'POST', 'data': {'search_term': term(i)}}),
+        ('/artists/create', 'artists.create_artist_form', lambda i: {'path': '/artists/create'}),
+        ('POST /artists/create', 'artists.create_artist_submission', lambda i: {'path': '/artists/create', 'method': 'POST', 'data': artist_form(i)}),
+        ('/artists/<id>/edit', 'artists.edit_artist', lambda i: {'path': '/artists/%d/edit' % artist(i)}),
+        ('POST /artists/<id>/edit', 'artists.edit_artist_submission', lambda i: {
+            'path': '/artists/%d/edit' % artist(i), 'method': 'POST', 'data': artist_form(100000 + i)
+        }),
+        ('/shows', 'shows.shows', lambda i: {'path': '/shows'}),
+        ('/shows/create', 'shows.create_shows', lambda i: {'path': '/shows/create'}),
+        ('POST /shows/create', 'shows.create_show_submission', lambda i: {'path': '/shows/create', 'method': 'POST', 'data': future_show(i)}),
+        ('/shows/batch', 'shows.create_show_batch', lambda i: {'path': '/shows/batch'}),
+        ('POST /shows/batch (50)', 'shows.create_show_batch_submission', lambda i: {
+            'path': '/shows/batch', 'method': 'POST', 'json': [future_show(i) for _ in range(50)]
+        }),
+        ('DELETE /venues/<id>', 'venues.delete_venue', lambda i: {'path': '/venues/%d' % deleted_venue(i), 'method': 'DELETE'}),
+        ('/export/venues.ndjson', 'export_venues', lambda i: {'path': '/export/venues.ndjson'}),
+        ('/export/artists.csv', 'export_artists', lambda i: {'path': '/export/artists.csv'}),
+        ('/export/shows.ndjson', 'export_shows', lambda i: {'path': '/export/shows.ndjson'}),
+        ('/api/v1/venues', 'api.venues', lambda i: {'path': '/api/v1/venues', 'query_string': {'include': 'shows'}}),
+        ('/api/v1/venues/<id>', 'api.venue', lambda i: {'path': '/api/v1/venues/%d' % venue(i)}),
+        ('/api/v1/artists', 'api.artists', lambda i: {'path': '/api/v1/artists'}),
+        ('/api/v1/artists/<id>', 'api.artist', lambda i: {'path': '/api/v1/artists/%d' % artist(i)}),
+        ('/api/v1/shows', 'api.shows', lambda i: {'path': '/api/v1/shows'}),
+        ('/diagnostics/cache', 'cache_stats', lambda i: {'path': '/diagnostics/cache'}),
+        ('/diagnostics/pool', 'database_pool_stats', lambda i: {'path': '/diagnostics/pool'}),
+        ('/metrics', 'metrics_endpoint', lambda i: {'path': '/metrics'}),
+        ('/static/css/main.css', 'static', lambda i: {'path': '/static/css/main.css'})
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--accept-encoding', default='', help='Accept-Encoding header to send')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    dataset = default_path(args.shows, args.seed)
+    if not os.path.exists(dataset):
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, 'dataset.py'), '--shows', str(args.shows), '--seed', str(args.seed)],
+            check=True
+        )
+    workdir = tempfile.mkdtemp(prefix='fyyur-bench-')
+    database = os.path.join(workdir, 'fyyur.db')
+    shutil.copy(dataset, database)
+    os.environ['FYYUR_PROFILE'] = 'sqlite'
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+    os.environ.pop('METRICS_DIR', None)
+
+    from sqlalchemy import event
+    from app import create_app
+    from config import SQLiteConfig
+    from forms import ArtistForm
+    from models import db, Venue, Artist, ArtistAvailability
+
+    class BenchmarkConfig(SQLiteConfig):
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(BenchmarkConfig)
+    queries = [0]
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'after_cursor_execute', lambda *_: queries.__setitem__(0, queries[0] + 1))
+        shift_to(datetime.datetime.now())
+        venue_ids = [row[0] for row in db.session.query(Venue.id)]
+        artist_ids = [row[0] for row in db.session.query(Artist.id)]
+        windows = {artist_id: [] for artist_id in artist_ids}
+        for artist_id, weekday, start, end in db.session.query(
+            ArtistAvailability.artist_id, ArtistAvailability.weekday,
+            ArtistAvailability.start_minute, ArtistAvailability.end_minute
+        ):
+            windows[artist_id].append((weekday, start, end))
+    genres = [value for value, _ in ArtistForm.genres.kwargs['choices']]
+
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    counter = itertools.count()
+    results = {}
+    try:
+        for name, endpoint, make in cases(venue_ids, artist_ids, windows, genres, rng):
+            requests = EXPORT_REQUESTS if endpoint.startswith('export_') else args.requests
+            # One untimed request compiles the templates and warms the caches
+            response = client.open(**make(next(counter)))
+            if response.is_json:
+                check_results(response.get_data(), name)
+            response.close()
+            check_flashes(client, name)
+            times, first_bytes, sizes, counts, statuses = [], [], [], [], {}
+            for _ in range(requests):
+                request = make(next(counter))
+                if args.accept_encoding:
+                    request['headers'] = {'Accept-Encoding': args.accept_encoding}
+                queries[0] = 0
+                started = time.perf_counter()
+                response = client.open(buffered=False, **request)
+                size = 0
+                first_byte = None
+                body = []
+                for chunk in response.iter_encoded():
+                    if chunk and first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    size += len(chunk)
+                    if response.is_json:
+                        body.append(chunk)
+                times.append(time.perf_counter() - started)
+                first_bytes.append(times[-1] if first_byte is None else first_byte)
+                sizes.append(size)
+                counts.append(queries[0])
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                response.close()
+                if body:
+                    check_results(b''.join(body), name)
+                check_flashes(client, name)
+            results[name] = {
+                'endpoint': endpoint,
+                'requests': requests,
+                'p50_ms': percentile(times, 0.5) * 1000,
+                'p95_ms': percentile(times, 0.95) * 1000,
+                'ttfb_p50_ms': percentile(first_bytes, 0.5) * 1000,
+                'bytes_mean': sum(sizes) / len(sizes),
+                'queries_mean': sum(counts) / len(counts),
+                'queries_max': max(counts),
+                'statuses': statuses
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print('%d shows, seed %d, %d requests per route (%d for exports), Accept-Encoding: %s\n' % (
+        args.shows, args.seed, args.requests, EXPORT_REQUESTS, args.accept_encoding or '(none)'))
+    print('%-28s %9s %9s %9s %9s %9s %6s  %s' % (
+        'route', 'p50 ms', 'p95 ms', 'ttfb ms', 'bytes', 'queries', 'max', 'statuses'))
+    for name, result in results.items():
+        print('%-28s %9.2f %9.2f %9.2f %9d %9.1f %6d  %s' % (
+            name, result['p50_ms'], result['p95_ms'], result['ttfb_p50_ms'], result['bytes_mean'],
+            result['queries_mean'], result['queries_max'],
+            ' '.join('%s:%d' % item for item in sorted(result['statuses'].items()))
+        ))
+
+    covered = {result['endpoint'] for result in results.values()}
+    missing = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered)
+    if missing:
+        print('\nnot benchmarked: ' + ', '.join(missing))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'shows': args.shows,
+                'seed': args.seed,
+                'accept_encoding': args.accept_encoding,
+                'python': platform.python_version(),
+                'routes': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Startup benchmark: times, in fresh interpreters, importing app.py, building
+the app with create_app() and serving the first request, and lists the
+modules that take longest to import.
+
+    python benchmarks/startup.py [--runs 10] [--shows 1000] [--seed 0] [--modules 15]
+
+Imports and create_app() are what a server preloads once before forking
+its workers; the first request is what each worker still pays on its own.
+The first request runs against a dataset (see dataset.py), generated on
+first use.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, HERE)
+
+from dataset import default_path
+
+CHILD = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get(%r)
+response.get_data()
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'status': response.status_code
+}))
+'''
+
+
+def run_child(code, env, *options):
+    return subprocess.run(
+        [sys.executable, *options, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def slowest_imports(env, count):
+    """
+    Returns (cumulative ms, module) for the modules that take longest to
+    import, their own imports included, when app.py is imported
+    """
+    stderr = run_child('import app', env, '-X', 'importtime').stderr
+    times = []
+    for line in stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        module = fields[2].strip()
+        if module != 'app':
+            times.append((int(fields[1]) / 1000, module))
+    return sorted(times, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--shows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--path', default='/', help='URL of the first request')
+    parser.add_argument('--modules', type=int, default=15, help='slowest imports to list')
+    args = parser.parse_args()
+
+    dataset = default_path(args.shows, args.seed)
+    if not os.path.exists(dataset):
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, 'dataset.py'), '--shows', str(args.shows), '--seed', str(args.seed)],
+            check=True
+        )
+    env = dict(os.environ, FYYUR_PROFILE='sqlite', DATABASE_URL='sqlite:///' + dataset)
+    env.pop('DATABASE_REPLICA_URL', None)
+    env.pop('METRICS_DIR', None)
+
+    runs = [json.loads(run_child(CHILD % args.path, env).stdout) for _ in range(args.runs)]
+    print('%d runs, first request GET %s (status %d)\n' % (args.runs, args.path, runs[0]['status']))
+    print('%-16s %9s %9s %9s' % ('phase', 'median ms', 'min ms', 'max ms'))
+    for phase in ('import_ms', 'create_app_ms', 'first_request_ms'):
+        values = [run[phase] for run in runs]
+        print('%-16s %9.1f %9.1f %9.1f' % (phase[:-3], statistics.median(values), min(values), max(values)))
+
+    if args.modules:
+        print('\nslowest imports (cumulative ms, one run)')
+        for ms, module in slowest_imports(env, args.modules):
+            print('%9.1f  %s' % (ms, module))
+
+
+if __name__ == '__main__':
+    main()
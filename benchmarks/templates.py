@@ -0,0 +1,143 @@
+"""
+Template benchmark: the latency of the first request a fresh worker serves
+for each page template, and the time to load each template, with and
+without the Jinja bytecode cache and precompilation.
+
+    python benchmarks/templates.py [--runs 3] [--shows 1000] [--seed 0]
+
+Modes, each in fresh interpreters:
+    compile      no bytecode cache; templates compile on first use
+    bytecode     a warm bytecode cache (JINJA_BYTECODE_CACHE_DIR)
+    precompiled  a warm cache and TEMPLATES_PRECOMPILE, as in production;
+                 create_app loads every template before the first request
+
+The first request runs against a dataset (see dataset.py), generated on
+first use.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, HERE)
+
+from dataset import default_path
+
+# template: test client open() arguments of a request that renders it
+PAGES = {
+    'pages/home.html': {'path': '/'},
+    'pages/venues.html': {'path': '/venues'},
+    'pages/show_venue.html': {'path': '/venues/1'},
+    'pages/search_venues.html': {'path': '/venues/search', 'method': 'POST', 'data': {'search_term': 'the'}},
+    'pages/artists.html': {'path': '/artists'},
+    'pages/show_artist.html': {'path': '/artists/1'},
+    'pages/search_artists.html': {'path': '/artists/search', 'method': 'POST', 'data': {'search_term': 'blue'}},
+    'pages/available_artists.html': {'path': '/artists/available', 'query_string': {'at': '2026-03-06T20:00'}},
+    'pages/shows.html': {'path': '/shows'},
+    'forms/new_venue.html': {'path': '/venues/create'},
+    'forms/edit_venue.html': {'path': '/venues/1/edit'},
+    'forms/new_artist.html': {'path': '/artists/create'},
+    'forms/edit_artist.html': {'path': '/artists/1/edit'},
+    'forms/new_show.html': {'path': '/shows/create'},
+    'forms/batch_shows.html': {'path': '/shows/batch'},
+    'errors/404.html': {'path': '/no-such-page'}
+}
+MODES = ('compile', 'bytecode', 'precompiled')
+
+CHILD = '''
+import json, sys, time
+from config import SQLiteConfig
+import app as application
+import templating
+
+class BenchmarkConfig(SQLiteConfig):
+    WTF_CSRF_ENABLED = False
+    JINJA_BYTECODE_CACHE_DIR = %(cache)r
+    TEMPLATES_PRECOMPILE = %(precompile)r
+
+started = time.perf_counter()
+app = application.create_app(BenchmarkConfig)
+created = time.perf_counter()
+request = %(request)r
+if request is None:
+    print(json.dumps(dict(templating.precompile(app))))
+    sys.exit()
+response = app.test_client().open(**request)
+response.get_data()
+print(json.dumps({
+    'create_app': created - started,
+    'first_request': time.perf_counter() - created,
+    'status': response.status_code
+}))
+'''
+
+
+def run_child(env, cache, precompile, request):
+    code = CHILD % {'cache': cache, 'precompile': precompile, 'request': request}
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--shows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = default_path(args.shows, args.seed)
+    if not os.path.exists(dataset):
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, 'dataset.py'), '--shows', str(args.shows), '--seed', str(args.seed)],
+            check=True
+        )
+    env = dict(os.environ, FYYUR_PROFILE='sqlite', DATABASE_URL='sqlite:///' + dataset)
+    env.pop('DATABASE_REPLICA_URL', None)
+    env.pop('METRICS_DIR', None)
+
+    cache = tempfile.mkdtemp(prefix='fyyur-jinja-')
+    try:
+        # The first run fills the cache, the second loads from it
+        run_child(env, cache, False, None)
+        load = {'compile': run_child(env, None, False, None), 'bytecode': run_child(env, cache, False, None)}
+        settings = {'compile': (None, False), 'bytecode': (cache, False), 'precompiled': (cache, True)}
+        first = {}
+        for template, request in PAGES.items():
+            for mode in MODES:
+                first[template, mode] = [run_child(env, *settings[mode], request) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    print('First request of a fresh worker, median of %d runs (ms)\n' % args.runs)
+    print('%-30s %9s %9s %12s  %s' % ('template', *MODES, 'status'))
+    totals = {mode: [] for mode in MODES}
+    for template in PAGES:
+        medians = []
+        for mode in MODES:
+            median = statistics.median(run['first_request'] for run in first[template, mode]) * 1000
+            totals[mode].append(median)
+            medians.append(median)
+        print('%-30s %9.1f %9.1f %12.1f  %d' % (template, *medians, first[template, MODES[0]][0]['status']))
+    print('%-30s %9.1f %9.1f %12.1f' % ('(mean)', *[statistics.mean(totals[mode]) for mode in MODES]))
+    print('%-30s %9.1f %9.1f %12.1f' % ('create_app (median)', *[
+        statistics.median(run['create_app'] for template in PAGES for run in first[template, mode]) * 1000
+        for mode in MODES
+    ]))
+
+    print('\nLoading each template (ms)\n')
+    print('%-30s %9s %9s' % ('template', 'compile', 'bytecode'))
+    for template in sorted(load['compile']):
+        print('%-30s %9.2f %9.2f' % (template, load['compile'][template] * 1000, load['bytecode'][template] * 1000))
+    print('%-30s %9.2f %9.2f' % ('(total)', *[sum(load[mode].values()) * 1000 for mode in ('compile', 'bytecode')]))
+
+
+if __name__ == '__main__':
+    main()
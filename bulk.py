@@ -0,0 +1,262 @@
+import csv
+import datetime
+import io
+import json
+import time
+from collections import defaultdict
+from werkzeug.datastructures import MultiDict
+from forms import ShowForm, VenueForm, ArtistForm
+from models import (
+    db, recount_show_counters, Venue, Artist, Show, VenueGenre, ArtistGenre, ArtistAvailability, DEFAULT_SHOW_DURATION
+)
+import availability
+from conflicts import ConflictChecker, describe
+import search
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# Rows stream from CSV or NDJSON, are validated with the same forms as the
+# create pages and are written in batches: COPY on Postgres, executemany
+# elsewhere. A batch commits as a whole; invalid rows are skipped and
+# reported, and a batch the database rejects is rolled back and reported
+# without stopping the import.
+#----------------------------------------------------------------------------#
+
+VENUE_FIELDS = ('name', 'city', 'state', 'address', 'phone', 'image_link', 'website_link', 'facebook_link')
+ARTIST_FIELDS = ('name', 'city', 'state', 'phone', 'image_link', 'website_link', 'facebook_link', 'available_hours')
+SHOW_FIELDS = ('artist_id', 'venue_id', 'start_time')
+
+def read_csv(f):
+    """
+    Yields (line number, row dict) from CSV with a header row; genres are
+    given as one comma-separated field
+    """
+    reader = csv.DictReader(f)
+    for row in reader:
+        if row.get('genres'):
+            row['genres'] = [genre.strip() for genre in row['genres'].split(',')]
+        yield reader.line_num, row
+
+class UnreadableRow(object):
+    """
+    Stands in for a line that could not be read as a row, so the import
+    reports it as rejected and goes on
+    """
+    def __init__(self, message):
+        self.message = message
+
+def read_ndjson(f):
+    """
+    Yields (line number, row dict) from one JSON object per line; a line
+    that is not valid JSON yields an UnreadableRow
+    """
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, UnreadableRow('Not valid JSON: {0}.'.format(e))
+
+def read_rows(path):
+    """
+    Yields (line number, row dict) from a CSV file or, for .ndjson/.jsonl
+    files, from an NDJSON file
+    """
+    with open(path, newline='') as f:
+        yield from (read_ndjson if path.endswith(('.ndjson', '.jsonl')) else read_csv)(f)
+
+def _formdata(row):
+    data = MultiDict()
+    for key, value in row.items():
+        if isinstance(value, list):
+            for item in value:
+                data.add(key, str(item))
+        elif value is not None:
+            data.add(key, str(value))
+    return data
+
+def _validate(form_class, row):
+    if isinstance(row, UnreadableRow):
+        return None, {'row': [row.message]}
+    if not isinstance(row, dict):
+        return None, {'row': ['Expected a JSON object, not {0}.'.format(type(row).__name__)]}
+    form = form_class(formdata=_formdata(row), meta={'csrf': False})
+    if form.validate():
+        return form, None
+    return None, form.errors
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _write(table, rows):
+    """
+    Inserts rows (dicts keyed by column name) with COPY on Postgres and an
+    executemany INSERT on any other database
+    """
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            'COPY "{0}" ({1}) FROM STDIN WITH (FORMAT csv)'.format(table.name, ', '.join(columns)),
+            buffer
+        )
+    else:
+        connection.execute(table.insert(), rows)
+
+def _ids_by_name(model, names):
+    return dict(db.session.query(model.name, model.id).filter(model.name.in_(names)))
+
+def _write_venues(forms):
+    now = datetime.datetime.utcnow()
+    _write(Venue.__table__, [
+        dict({field: form[field].data for field in VENUE_FIELDS}, date_added=now, updated_at=now)
+        for form in forms
+    ])
+    ids = _ids_by_name(Venue, [form.name.data for form in forms])
+    _write(VenueGenre.__table__, [
+        {'venue_id': ids[form.name.data], 'genre': genre}
+        for form in forms for genre in dict.fromkeys(form.genres.data)
+    ])
+    search.index_venues(ids.values())
+    return {'venue_ids': list(ids.values())}
+
+def _write_artists(forms):
+    now = datetime.datetime.utcnow()
+    _write(Artist.__table__, [
+        dict(
+            {field: form[field].data for field in ARTIST_FIELDS},
+            available_hours=form.available_hours.data or None, date_added=now, updated_at=now
+        )
+        for form in forms
+    ])
+    ids = _ids_by_name(Artist, [form.name.data for form in forms])
+    _write(ArtistGenre.__table__, [
+        {'artist_id': ids[form.name.data], 'genre': genre}
+        for form in forms for genre in dict.fromkeys(form.genres.data)
+    ])
+    _write(ArtistAvailability.__table__, [
+        {'artist_id': ids[form.name.data], 'weekday': weekday, 'start_minute': start, 'end_minute': end}
+        for form in forms for weekday, start, end in availability.parse(form.available_hours.data)
+    ])
+    search.index_artists(ids.values())
+    return {'artist_ids': list(ids.values())}
+
+def _end_time(form):
+    if form.duration.data:
+        return form.start_time.data + datetime.timedelta(minutes=form.duration.data)
+    return form.start_time.data + DEFAULT_SHOW_DURATION
+
+def _write_shows(forms):
+    _write(Show.__table__, [
+        dict({field: form[field].data for field in SHOW_FIELDS}, end_time=_end_time(form))
+        for form in forms
+    ])
+    venue_ids = {form.venue_id.data for form in forms}
+    artist_ids = {form.artist_id.data for form in forms}
+    recount_show_counters(venue_ids=venue_ids, artist_ids=artist_ids)
+    return {'venue_ids': list(venue_ids), 'artist_ids': list(artist_ids)}
+
+def _check_shows(valid, rejected):
+    # Reject shows whose artist or venue does not exist, whose artist is not
+    # available then, or that clash with a booked show or an earlier row,
+    # before writing, so one bad row does not fail the whole batch on a
+    # constraint. Everything is loaded up front and checked in memory
+    venue_ids = {form.venue_id.data for _, form in valid}
+    artist_ids = {form.artist_id.data for _, form in valid}
+    venues = {row[0] for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    artists = {row[0] for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    windows = defaultdict(list)
+    for artist_id, weekday, start, end in db.session.query(
+        ArtistAvailability.artist_id, ArtistAvailability.weekday,
+        ArtistAvailability.start_minute, ArtistAvailability.end_minute
+    ).filter(ArtistAvailability.artist_id.in_(artist_ids)):
+        windows[artist_id].append((weekday, start, end))
+    checker = ConflictChecker()
+    checker.load(
+        artist_ids, venue_ids,
+        min(form.start_time.data for _, form in valid),
+        max(_end_time(form) for _, form in valid)
+    )
+    checked = []
+    for number, form in valid:
+        errors = {}
+        if form.venue_id.data not in venues:
+            errors['venue_id'] = ['That venue does not exist.']
+        if form.artist_id.data not in artists:
+            errors['artist_id'] = ['That artist does not exist.']
+        elif not availability.is_available(windows[form.artist_id.data], form.start_time.data):
+            errors['start_time'] = ['The artist is not available at that time.']
+        booking = (form.artist_id.data, form.venue_id.data, form.start_time.data, _end_time(form))
+        conflicts = checker.conflicts(*booking)
+        if conflicts:
+            errors.setdefault('start_time', []).extend(describe(kind, show) for kind, show in conflicts)
+        if errors:
+            rejected.append((number, errors))
+        else:
+            checker.book(*booking)
+            checked.append((number, form))
+    return checked
+
+IMPORTERS = {
+    'venues': (VenueForm, _write_venues, None),
+    'artists': (ArtistForm, _write_artists, None),
+    'shows': (ShowForm, _write_shows, _check_shows)
+}
+
+def import_rows(kind, rows, batch_size=1000):
+    """
+    Validates and writes (line number, row) pairs of the given kind
+    ('venues', 'artists' or 'shows'), yielding one report dict per batch
+    with the rows written, the rejected rows and their errors, any database
+    error, the IDs of the entities whose pages changed and the batch time
+    """
+    form_class, write, check = IMPORTERS[kind]
+    for batch in _batches(rows, batch_size):
+        started = time.perf_counter()
+        valid = []
+        rejected = []
+        for number, row in batch:
+            form, errors = _validate(form_class, row)
+            if form is None:
+                rejected.append((number, errors))
+            else:
+                valid.append((number, form))
+
+        report = {
+            'first_line': batch[0][0],
+            'last_line': batch[-1][0],
+            'written': 0,
+            'rejected': rejected,
+            'error': None,
+            'venue_ids': [],
+            'artist_ids': []
+        }
+        try:
+            if check is not None and valid:
+                valid = check(valid, rejected)
+            if valid:
+                report.update(write([form for _, form in valid]))
+            db.session.commit()
+            report['written'] = len(valid)
+        except Exception as e:
+            db.session.rollback()
+            report['error'] = str(e).splitlines()[0]
+        rejected.sort(key=lambda rejection: rejection[0])
+        report['seconds'] = time.perf_counter() - started
+        yield report
@@ -0,0 +1,194 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha1
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#
+# Each backend stores pickleable values under string keys with a TTL and
+# implements get(key) -> value or None, set(key, value), delete(*keys) and
+# clear(). MemoryCache is private to the process; RedisCache is shared by
+# every worker, and FileSystemCache stands in for it on one machine.
+#----------------------------------------------------------------------------#
+
+class MemoryCache:
+    """
+    In-process LRU cache whose entries also expire after ttl seconds
+    """
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Cache shared by every worker through a Redis server
+    """
+    def __init__(self, url, ttl=60, prefix='fyyur:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class FileSystemCache:
+    """
+    Cache shared by the workers on one machine through a directory of
+    pickled entries, a local stand-in for RedisCache
+    """
+    def __init__(self, directory, ttl=60):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value):
+        # Write then rename so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + self.ttl, value), f)
+        os.replace(temp_path, self._path(key))
+
+    def delete(self, *keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+#----------------------------------------------------------------------------#
+# Entity cache.
+#----------------------------------------------------------------------------#
+
+class EntityCache:
+    """
+    Read-through cache of the assembled venue and artist page dicts. Each
+    entry is stored with the tag (the page's ETag) it was loaded under and
+    is only returned for the same tag, so a page whose validators changed
+    is reloaded even if no write path invalidated it here: a show starting,
+    an edit made through another worker, or an entry filled from a lagging
+    replica. The write paths also call invalidate with the IDs whose pages
+    they changed
+    """
+    def __init__(self, app=None):
+        self.backend = MemoryCache()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_TTL', 60)
+        if backend == 'memory':
+            self.backend = MemoryCache(maxsize=app.config.get('CACHE_MAXSIZE', 1024), ttl=ttl)
+        elif backend == 'redis':
+            self.backend = RedisCache(app.config['CACHE_REDIS_URL'], ttl=ttl)
+        elif backend == 'filesystem':
+            self.backend = FileSystemCache(app.config['CACHE_DIR'], ttl=ttl)
+        else:
+            raise ValueError('Unknown CACHE_BACKEND: ' + backend)
+        app.extensions['entity_cache'] = self
+
+    def get_or_load(self, key, tag, load):
+        """
+        Returns the value cached for key under tag, calling load() to fill
+        it on a miss or when the entry has another tag. A None result is
+        returned but not cached
+        """
+        entry = self.backend.get(key)
+        # Shared backends may still hold untagged entries written before
+        if isinstance(entry, tuple) and entry[0] == tag:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = load()
+        if value is not None:
+            self.backend.set(key, (tag, value))
+        return value
+
+    def venue(self, venue_id, tag, load):
+        return self.get_or_load('venue:%d' % venue_id, tag, load)
+
+    def artist(self, artist_id, tag, load):
+        return self.get_or_load('artist:%d' % artist_id, tag, load)
+
+    def invalidate(self, venue_ids=(), artist_ids=()):
+        keys = ['venue:%d' % int(venue_id) for venue_id in venue_ids]
+        keys += ['artist:%d' % int(artist_id) for artist_id in artist_ids]
+        self.backend.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None
+        }
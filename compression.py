@@ -0,0 +1,102 @@
+import zlib
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#----------------------------------------------------------------------------#
+# Response compression.
+#
+# Compresses a streamed body on the fly, with brotli (when the package is
+# installed) or gzip, whichever the client's Accept-Encoding allows. The
+# body is passed on in blocks of COMPRESS_BUFFER_SIZE bytes, each flushed
+# through the compressor so the browser can start on the page before it
+# has all of it. Bodies smaller than COMPRESS_MIN_SIZE are sent as they are,
+# since compressing them saves less than it costs.
+#----------------------------------------------------------------------------#
+
+class _Gzip:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+class _Brotli:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+def negotiate(accept_encodings):
+    """
+    Returns 'br', 'gzip' or None, the best encoding the client accepts that
+    can be produced here
+    """
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def _blocks(chunks, size):
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+def _compressed(first, blocks, compressor):
+    yield compressor.compress(first)
+    for block in blocks:
+        yield compressor.compress(block)
+    yield compressor.finish()
+
+def _plain(first, blocks):
+    yield first
+    yield from blocks
+
+def streamed_response(chunks, mimetype='text/html'):
+    """
+    Returns a response that streams chunks (str or bytes), compressed when
+    the client accepts it and the body is big enough. The first block is
+    produced here, before the headers are chosen; the rest as the server
+    sends the body
+    """
+    config = current_app.config
+    # The first block decides the encoding, so it must hold at least the threshold
+    size = max(config['COMPRESS_BUFFER_SIZE'], config['COMPRESS_MIN_SIZE'])
+    blocks = _blocks(chunks, size)
+    first = next(blocks, b'')
+    encoding = None
+    if config['RESPONSE_COMPRESSION'] and len(first) >= config['COMPRESS_MIN_SIZE']:
+        encoding = negotiate(request.accept_encodings)
+
+    if encoding == 'br':
+        body = _compressed(first, blocks, _Brotli(config['COMPRESS_BROTLI_QUALITY']))
+    elif encoding == 'gzip':
+        body = _compressed(first, blocks, _Gzip(config['COMPRESS_GZIP_LEVEL']))
+    else:
+        body = _plain(first, blocks)
+    response = Response(body, mimetype=mimetype)
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    return response
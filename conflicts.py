@@ -0,0 +1,175 @@
+import random
+from collections import defaultdict
+from sqlalchemy import func, or_
+from models import db, Show, MAX_SHOW_DURATION
+
+#----------------------------------------------------------------------------#
+# Booking conflicts.
+#
+# A show occupies its artist and its venue over [start_time, end_time). On
+# Postgres two exclusion constraints make overlaps impossible, and their
+# GiST indexes answer the overlap lookups below; elsewhere the lookups are
+# range scans on the (venue_id, start_time) and (artist_id, start_time)
+# indexes, bounded by MAX_SHOW_DURATION. Loaded shows and bookings not yet
+# written go into per-artist and per-venue interval trees, so a whole batch
+# is checked in memory against the database and against itself.
+#----------------------------------------------------------------------------#
+
+class _Node:
+    __slots__ = ('start', 'end', 'value', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, start, end, value):
+        self.start = start
+        self.end = end
+        self.value = value
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+    def update(self):
+        self.max_end = self.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+
+class IntervalTree:
+    """
+    Half-open intervals in a treap ordered by start and augmented with the
+    greatest end in each subtree: O(log n) inserts and O(log n + k) lookups
+    of the k intervals overlapping a query
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, start, end, value):
+        self.root = self._insert(self.root, _Node(start, end, value))
+        self.size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.start < node.start:
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                node = self._rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                node = self._rotate_left(node)
+        node.update()
+        return node
+
+    def _rotate_right(self, node):
+        left = node.left
+        node.left, left.right = left.right, node
+        node.update()
+        left.update()
+        return left
+
+    def _rotate_left(self, node):
+        right = node.right
+        node.right, right.left = right.left, node
+        node.update()
+        right.update()
+        return right
+
+    def overlapping(self, start, end):
+        """
+        Returns the values of the intervals overlapping [start, end)
+        """
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            # Nothing in this subtree ends after start
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            # Nodes to the right start no earlier than this one
+            if node.start < end:
+                if node.end > start:
+                    found.append(node.value)
+                stack.append(node.right)
+        return found
+
+
+def overlaps(start, end):
+    """
+    Returns the SQL condition for shows overlapping [start, end) in the form
+    the current database can answer from an index
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start, end))
+    return (Show.start_time < end) & (Show.start_time > start - MAX_SHOW_DURATION) & (Show.end_time > start)
+
+
+class ConflictChecker:
+    """
+    Finds artist double-bookings and venue overlaps. Call load() with the
+    artists, venues and time window about to be checked, then conflicts()
+    for each booking and book() for each one accepted
+    """
+    def __init__(self):
+        self.artists = defaultdict(IntervalTree)
+        self.venues = defaultdict(IntervalTree)
+        self.loaded = set()
+
+    def load(self, artist_ids, venue_ids, start, end):
+        """
+        Loads the shows of the given artists and venues that overlap
+        [start, end) in one query
+        """
+        artist_ids = list(artist_ids)
+        venue_ids = list(venue_ids)
+        if not artist_ids and not venue_ids:
+            return
+        shows = db.session.query(
+            Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.end_time
+        ).filter(
+            or_(Show.artist_id.in_(artist_ids), Show.venue_id.in_(venue_ids)),
+            overlaps(start, end)
+        )
+        for show_id, artist_id, venue_id, show_start, show_end in shows:
+            if show_id not in self.loaded:
+                self.loaded.add(show_id)
+                self._add(artist_id, venue_id, show_start, show_end, {
+                    'show_id': show_id, 'artist_id': artist_id, 'venue_id': venue_id,
+                    'start_time': show_start, 'end_time': show_end
+                })
+
+    def _add(self, artist_id, venue_id, start, end, show):
+        self.artists[artist_id].insert(start, end, show)
+        self.venues[venue_id].insert(start, end, show)
+
+    def conflicts(self, artist_id, venue_id, start, end):
+        """
+        Returns (kind, show) pairs for the loaded or booked shows that the
+        booking would clash with; kind is 'artist' or 'venue'
+        """
+        found = [('artist', show) for show in self.artists[artist_id].overlapping(start, end)]
+        found += [('venue', show) for show in self.venues[venue_id].overlapping(start, end)]
+        return found
+
+    def book(self, artist_id, venue_id, start, end):
+        """
+        Records an accepted booking so later checks see it
+        """
+        self._add(artist_id, venue_id, start, end, {
+            'show_id': None, 'artist_id': artist_id, 'venue_id': venue_id,
+            'start_time': start, 'end_time': end
+        })
+
+
+def describe(kind, show):
+    """
+    Returns a message explaining a conflict found by ConflictChecker
+    """
+    if kind == 'artist':
+        return 'The artist is already booked from %s to %s.' % (show['start_time'], show['end_time'])
+    return 'The venue already has a show from %s to %s.' % (show['start_time'], show['end_time'])
@@ -0,0 +1,106 @@
+import csv
+import io
+import itertools
+import json
+from models import db, Venue, Artist, Show, VenueGenre, ArtistGenre
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#
+# Each export reads through a server-side cursor (yield_per) and yields its
+# output in chunks, so memory stays flat however many rows there are and
+# the first bytes go out before the query has finished.
+#----------------------------------------------------------------------------#
+
+BATCH_SIZE = 1000
+VENUE_COLUMNS = (
+    'id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'website_link', 'facebook_link',
+    'seeking_talent', 'seeking_description', 'upcoming_shows_count', 'past_shows_count'
+)
+ARTIST_COLUMNS = (
+    'id', 'name', 'city', 'state', 'phone', 'image_link', 'website_link', 'facebook_link',
+    'seeking_venue', 'seeking_description', 'available_hours', 'upcoming_shows_count', 'past_shows_count'
+)
+
+def _with_genres(model, genre_model, genre_fk, columns):
+    """
+    Yields (row, genres) for every entity in ID order. Genres come from an
+    outer join whose rows for one entity arrive together, so they are
+    grouped without holding more than one entity in memory
+    """
+    query = db.session.query(
+        *[getattr(model, column) for column in columns], genre_model.genre
+    ).outerjoin(
+        genre_model, genre_fk == model.id
+    ).order_by(model.id, genre_model.genre).yield_per(BATCH_SIZE)
+
+    for _, rows in itertools.groupby(query, key=lambda row: row[0]):
+        rows = list(rows)
+        yield rows[0][:-1], [row[-1] for row in rows if row[-1] is not None]
+
+def _chunked(lines):
+    for chunk in iter(lambda: list(itertools.islice(lines, BATCH_SIZE)), []):
+        yield ''.join(chunk)
+
+def _json_default(value):
+    return value.isoformat()
+
+def venues_ndjson():
+    """
+    Yields every Venue as NDJSON
+    """
+    def lines():
+        for row, genres in _with_genres(Venue, VenueGenre, VenueGenre.venue_id, VENUE_COLUMNS):
+            record = dict(zip(VENUE_COLUMNS, row))
+            record['genres'] = genres
+            yield json.dumps(record, default=_json_default) + '\n'
+    return _chunked(lines())
+
+def artists_csv():
+    """
+    Yields every Artist as CSV with a header row; genres are one
+    comma-separated field
+    """
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(ARTIST_COLUMNS + ('genres',))
+        for row, genres in _with_genres(Artist, ArtistGenre, ArtistGenre.artist_id, ARTIST_COLUMNS):
+            writer.writerow(tuple(row) + (','.join(genres),))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    return _chunked(lines())
+
+def shows_ndjson(start=None, end=None):
+    """
+    Yields the Shows starting in [start, end) as NDJSON, in start time
+    order, with their venue and artist names and their duration in minutes
+    so the lines can be imported again as they are
+    """
+    query = db.session.query(
+        Show.id, Show.start_time, Show.end_time, Show.venue_id, Venue.name, Show.artist_id, Artist.name
+    ).join(
+        Venue, Venue.id == Show.venue_id
+    ).join(
+        Artist, Artist.id == Show.artist_id
+    )
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    query = query.order_by(Show.start_time, Show.id).yield_per(BATCH_SIZE)
+
+    def lines():
+        for show_id, start_time, end_time, venue_id, venue_name, artist_id, artist_name in query:
+            yield json.dumps({
+                'id': show_id,
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'duration': int((end_time - start_time).total_seconds() // 60),
+                'venue_id': venue_id,
+                'venue_name': venue_name,
+                'artist_id': artist_id,
+                'artist_name': artist_name
+            }) + '\n'
+    return _chunked(lines())
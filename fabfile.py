@@ -7,12 +7,24 @@ from fabric.contrib.console import confirm
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest -q tests", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def bench(shows=10000):
+    local("python benchmarks/routes.py --shows {}".format(shows))
+
+
+def bench_startup(runs=10):
+    local("python benchmarks/startup.py --runs {}".format(runs))
+
+
+def bench_templates(runs=3):
+    local("python benchmarks/templates.py --runs {}".format(runs))
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,45 @@
+import datetime
+import functools
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+@functools.lru_cache(maxsize=None)
+def _datetime_pattern(format, locale):
+    """
+    Returns the compiled Babel pattern and parsed locale for a format name
+    or pattern string, or None for Babel's own named formats
+    """
+    # Babel is imported on the first page that formats a date, not at startup
+    import babel.dates
+    pattern = DATETIME_FORMATS.get(format, format)
+    if pattern in ('full', 'long', 'medium', 'short'):
+        return None, locale
+    return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=4096)
+def _format_datetime(value, format, locale):
+    pattern, parsed_locale = _datetime_pattern(format, locale)
+    if pattern is None:
+        import babel.dates
+        return babel.dates.format_datetime(value, format, locale=locale)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return pattern.apply(value, parsed_locale)
+
+def format_datetime(value, format='medium', locale='en'):
+    """
+    Formats a show time for templates. Takes a datetime, or a string it
+    parses first; results are memoized per (value, format, locale)
+    """
+    if isinstance(value, str):
+        # Templates pass datetimes, so dateutil is rarely needed
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    return _format_datetime(value, format, locale)
@@ -1,51 +1,60 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, SubmitField, IntegerField
-from wtforms.validators import ValidationError, DataRequired, AnyOf, URL, Length, NumberRange, Optional
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, SubmitField, IntegerField, TextAreaField
+from wtforms.validators import ValidationError, DataRequired, InputRequired, AnyOf, URL, Length, NumberRange, Optional
 from enum import Enum
+import availability
 # from models import Artist, Venue, Show
 
 
+class ShowTimeField(DateTimeField):
+    """
+    DateTimeField whose error for a malformed value names the formats it
+    accepts
+    """
+    def process_formdata(self, valuelist):
+        try:
+            super().process_formdata(valuelist)
+        except ValueError:
+            raise ValueError('Not a valid datetime value, expected YYYY-MM-DD HH:MM[:SS] or YYYY-MM-DDTHH:MM[:SS].')
+
+
 class ShowForm(FlaskForm):
+    # InputRequired rather than DataRequired, which would replace the
+    # "Not a valid integer/datetime value" error of a malformed value
+    # with "This field is required."
     artist_id = IntegerField(
         'artist_id',
-        validators=[DataRequired(), NumberRange(min=1, message="Please enter a numeric ID")]
+        validators=[InputRequired(), NumberRange(min=1, message="Please enter a numeric ID")]
     )   
     venue_id = IntegerField(
         'venue_id',
-        validators=[DataRequired(), NumberRange(min=1, message="Please enter a numeric ID")]       
+        validators=[InputRequired(), NumberRange(min=1, message="Please enter a numeric ID")]       
     )   
-    start_time = DateTimeField(
+    # Also ISO 8601 with a 'T', as JSON clients and the show export write it
+    start_time = ShowTimeField(
         'start_time',
-        validators=[DataRequired()],
+        validators=[InputRequired()],
+        format=['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M'],
         default=datetime.today()
     )
 
-    # Could not get this to work. Cannot import db and the models
-    # def validate_artist_id(self, artist_id):
-    #     artist = Artist.query.filter_by(artist_id=artist_id).first()
-    #     if artist is None:
-    #         raise ValidationError('That artist does not exist.')
-
-    # def validate_venue_id(self, venue_id):
-    #     venue = Venue.query.filter_by(venue_id=venue_id).first()
-    #     if venue is None:
-    #         raise ValidationError('That venue does not exist.')        
-
-    # def validate_show_already_booked(self, artist_id, venue_id, start_time): 
-    #     show = Show.query.filter_by(artist_id=artist_id.data, venue_id=venue_id, start_time=start_time)
-    #     if show is not None:
-    #         raise ValidationError('This artist is already booked at the venue for that time.')
-    
-    # def validate_time_clash(self, venue_id, start_time): 
-    #     show = Show.query.filter_by(venue_id=venue_id, start_time=start_time)
-    #     if show is not None:
-    #         raise ValidationError('There is already a show at that venue at the specified time.')
-    
-    # def validate_double_booked(self, artist_id, venue_id, start_time): 
-    #     show = Show.query.filter_by(artist_id=artist_id, start_time=start_time)
-    #     if show is not None:
-    #         raise ValidationError('This artist is already booked elsewhere at the specified time.')
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=1440, message="Please enter a duration of 1 to 1440 minutes")],
+        default=120
+    )
+
+    # Artist double-bookings and venue time clashes are checked against
+    # the database by conflicts.ConflictChecker when the show is saved
+
+
+class ShowBatchForm(FlaskForm):
+    # CSV with an artist_id,venue_id,start_time[,duration] header; each row
+    # is validated like a ShowForm (see bulk.py)
+    rows = TextAreaField(
+        'rows', validators=[DataRequired()]
+    )
 
 
 class USState(Enum):
@@ -210,28 +219,13 @@ class ArtistForm(FlaskForm):
         'facebook_link', validators=[Optional(), URL()]
     )
     available_hours = StringField(
-        'available_hours', validators=[Optional(), Length(min=5, max=5)]
+        'available_hours', validators=[Optional(), Length(max=200)]
     )
 
     def validate_available_hours(self, available_hours):
-        available_hours_parts = available_hours.data.split('-')
-        try:
-            from_hour = int(available_hours_parts[0])
-        except Exception:
-            raise ValidationError("Invalid format for available hours.")
-
         try:
-            to_hour = int(available_hours_parts[1])
-        except Exception:
-            raise ValidationError("Invalid format for available hours.")        
-
-        try:
-            from_hour = int(available_hours_parts[0])
-            to_hour = int(available_hours_parts[1])
-
-            if to_hour <= from_hour:
-                raise ValidationError("Invalid format for available hours.")           
-        except Exception:
-            raise ValidationError("Invalid format for available hours.")   
+            availability.parse(available_hours.data)
+        except ValueError as e:
+            raise ValidationError(str(e))
 
 # TODO IMPLEMENT NEW ARTIST FORM AND NEW SHOW FORM
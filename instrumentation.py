@@ -0,0 +1,102 @@
+import re
+import time
+from collections import Counter
+from flask import before_render_template, template_rendered, current_app, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+#----------------------------------------------------------------------------#
+# SQL instrumentation.
+#
+# Opt-in (SQL_INSTRUMENTATION) per-request accounting built on engine
+# events: how many statements ran, the time spent in the database and in
+# templates, and how often each statement fingerprint repeated. Responses
+# carry the timings in a Server-Timing header, which browser dev tools
+# show next to the request; a fingerprint repeated more than
+# SQL_REPEATED_QUERY_THRESHOLD times is logged as a likely N+1 query.
+#----------------------------------------------------------------------------#
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|:\w+|\$\d+'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),
+    (re.compile(r'\s+'), ' ')
+]
+
+def fingerprint(statement):
+    """
+    Returns statement with its literals, placeholders and IN lists reduced
+    to ?, so runs that differ only in parameters compare equal
+    """
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+class SQLInstrumentation:
+    """
+    Records the statements, database time and template time of each
+    request in g.sql and reports them in a Server-Timing header
+    """
+    def __init__(self, app=None):
+        self.threshold = 10
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_INSTRUMENTATION'):
+            return
+        self.threshold = app.config.get('SQL_REPEATED_QUERY_THRESHOLD', 10)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['sql_instrumentation'] = self
+
+    def _start(self):
+        g.sql = {
+            'started': time.perf_counter(),
+            'count': 0,
+            'seconds': 0.0,
+            'template_seconds': 0.0,
+            'fingerprints': Counter()
+        }
+
+    def _before_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info['query_started'].pop()
+        if has_request_context() and 'sql' in g:
+            g.sql['count'] += 1
+            g.sql['seconds'] += elapsed
+            g.sql['fingerprints'][fingerprint(statement)] += 1
+
+    def _before_render(self, app, template, context, **extra):
+        if 'sql' in g:
+            g.sql['template_started'] = time.perf_counter()
+
+    def _after_render(self, app, template, context, **extra):
+        if 'sql' in g and 'template_started' in g.sql:
+            g.sql['template_seconds'] += time.perf_counter() - g.sql.pop('template_started')
+
+    def _finish(self, response):
+        if 'sql' not in g:
+            return response
+        stats = g.sql
+        for statement, count in stats['fingerprints'].most_common():
+            if count <= self.threshold:
+                break
+            current_app.logger.warning(
+                'Statement ran %d times in one request to %s %s (possible N+1): %s',
+                count, request.method, request.path, statement[:500]
+            )
+        total = time.perf_counter() - stats['started']
+        response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (stats['seconds'] * 1000, stats['count']))
+        response.headers.add('Server-Timing', 'tpl;dur=%.1f' % (stats['template_seconds'] * 1000))
+        response.headers.add('Server-Timing', 'app;dur=%.1f' % (total * 1000))
+        return response
@@ -0,0 +1,218 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+#----------------------------------------------------------------------------#
+# Logging.
+#
+# Request threads only format a record as one JSON line and put it on a
+# bounded queue; a QueueListener thread writes the lines to LOG_FILE,
+# rotated by size or time, or left for an outside tool such as logrotate
+# to rotate. A full queue drops records (counted in QueueHandler.dropped)
+# rather than blocking a request on a slow disk. A worker forked from a
+# preloaded app starts its own writer thread, since threads do not survive
+# fork. Only one process can rotate a file, so several workers need
+# LOG_ROTATION 'external'; forked workers fall back to it regardless.
+# Records made during a request carry its id (X-Request-ID, generated when
+# the client sends none), method, path and endpoint, and each request gets
+# one access record with its status and timings. With LOG_SAMPLE_RATE
+# below 1 only that fraction of requests keep their INFO and DEBUG records,
+# chosen by request id so a request's records are kept or dropped together.
+#----------------------------------------------------------------------------#
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as a JSON object on one line
+    """
+    FIELDS = ('request_id', 'method', 'path', 'endpoint', 'status', 'duration_ms', 'db_ms', 'queries')
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'source': '%s:%d' % (record.pathname, record.lineno)
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestFilter(logging.Filter):
+    """
+    Adds the current request's details to records and drops the INFO and
+    DEBUG records of requests left out by sampling
+    """
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        if record.levelno < logging.WARNING and not g.get('log_sampled', True):
+            return False
+        record.request_id = g.get('request_id')
+        record.method = request.method
+        record.path = request.path
+        record.endpoint = request.endpoint
+        return True
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records when the queue is full, and stops the
+    listener writing its queue when closed
+    """
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+        self.listener = None
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Format on the request thread, while the request's details are on
+        # the record, and queue only the finished line
+        return logging.makeLogRecord({'msg': self.format(record), 'levelno': record.levelno, 'levelname': record.levelname})
+
+    def listen(self, target):
+        """
+        Starts a listener thread writing the queue to the target handler
+        """
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+
+    def close(self):
+        """
+        Writes out the queued records and stops the listener
+        """
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+            for target in listener.handlers:
+                target.close()
+        super().close()
+
+def _file_handler(config, shared=False):
+    """
+    Returns the handler writing LOG_FILE. When other processes write the
+    file too (shared) or LOG_ROTATION is 'external', the file is reopened
+    once something else has rotated it rather than rotated here
+    """
+    if shared or config['LOG_ROTATION'] == 'external':
+        handler = logging.handlers.WatchedFileHandler(config['LOG_FILE'])
+    elif config['LOG_ROTATION'] == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            config['LOG_FILE'], when=config['LOG_ROTATE_WHEN'], backupCount=config['LOG_BACKUP_COUNT'], utc=True
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT']
+        )
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+def sampled(request_id, rate):
+    """
+    Returns whether the request with request_id keeps its INFO records,
+    the same answer in every worker
+    """
+    if rate >= 1:
+        return True
+    return uuid.uuid5(uuid.NAMESPACE_OID, request_id).int % 10000 < rate * 10000
+
+class RequestLogging:
+    """
+    Sends app.logger's records through a queue to the rotating log file, in
+    place of Flask's console handler, and logs an access record per
+    request. In debug mode Flask's console logging is left as it is
+    """
+    def __init__(self, app=None):
+        self.handler = None
+        self.logger = None
+        self.config = None
+        self.sample_rate = 1.0
+        self.access_log = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.debug or 'request_logging' in app.extensions:
+            return
+        config = self.config = app.config
+        self.logger = app.logger
+        self.sample_rate = config['LOG_SAMPLE_RATE']
+        self.access_log = config['LOG_REQUESTS']
+        self.handler = QueueHandler(queue.Queue(maxsize=config['LOG_QUEUE_SIZE']))
+        self.handler.setFormatter(JSONFormatter())
+        self.handler.addFilter(RequestFilter())
+        self.handler.listen(_file_handler(config))
+        # Write out what is still queued when the process exits
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forked)
+        app.logger.setLevel(config['LOG_LEVEL'])
+        app.logger.removeHandler(default_handler)
+        # Apps made earlier in this process share the logger; the newest
+        # one's handler replaces theirs
+        for handler in list(app.logger.handlers):
+            if isinstance(handler, QueueHandler):
+                app.logger.removeHandler(handler)
+                handler.close()
+        app.logger.addHandler(self.handler)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['request_logging'] = self
+
+    def stop(self):
+        """
+        Writes out the queued records and stops the writer thread
+        """
+        if self.handler is not None:
+            self.handler.close()
+
+    def _forked(self):
+        # The parent's writer thread does not exist in this process and its
+        # queue may have been mid-update; start over with new ones
+        handler = self.handler
+        if handler is None or handler.listener is None or handler not in self.logger.handlers:
+            return
+        for target in handler.listener.handlers:
+            target.close()
+        handler.queue = queue.Queue(maxsize=self.config['LOG_QUEUE_SIZE'])
+        handler.listen(_file_handler(self.config, shared=True))
+        if self.config['LOG_ROTATION'] != 'external':
+            self.logger.warning(
+                "LOG_ROTATION is %r but workers share LOG_FILE, so it is not rotated; "
+                "set it to 'external' and rotate it with logrotate or similar", self.config['LOG_ROTATION']
+            )
+
+    def _start(self):
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_sampled = sampled(g.request_id, self.sample_rate)
+        g.log_started = time.perf_counter()
+
+    def _finish(self, response):
+        if 'log_started' not in g:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        if self.access_log:
+            timings = {'status': response.status_code, 'duration_ms': round((time.perf_counter() - g.log_started) * 1000, 2)}
+            # With SQL instrumentation on, the database's share as well
+            if 'sql' in g:
+                timings['db_ms'] = round(g.sql['seconds'] * 1000, 2)
+                timings['queries'] = g.sql['count']
+            current_app.logger.info('%s %s %d', request.method, request.path, response.status_code, extra=timings)
+        return response
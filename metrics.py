@@ -0,0 +1,353 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from flask import before_render_template, template_rendered, g, request
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#
+# Request counts and latency per endpoint, template render time, database
+# pool checkout wait and entity cache hits, aggregated in process memory
+# and served at /metrics in the Prometheus text format. Each worker keeps
+# its own totals; with METRICS_DIR set it also writes them to
+# METRICS_DIR/worker-<pid>-<token>.json every METRICS_FLUSH_INTERVAL
+# seconds, and /metrics sums the files of every worker. The token is new
+# in every process, so a worker given the PID of one that exited does not
+# overwrite its file. /metrics folds the files of exited workers into
+# METRICS_DIR/exited.json, keeping their counters and histograms so totals
+# never go backwards, and drops their gauges.
+#----------------------------------------------------------------------------#
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help, label names)
+METRICS = {
+    'fyyur_http_requests_total': (
+        'counter', 'Requests handled, by endpoint, method and status', ('endpoint', 'method', 'status')
+    ),
+    'fyyur_http_request_duration_seconds': (
+        'histogram', 'Time to build the response, by endpoint', ('endpoint',)
+    ),
+    'fyyur_template_render_seconds': (
+        'histogram', 'Time to render a template, by template', ('template',)
+    ),
+    'fyyur_db_pool_checkout_wait_seconds': (
+        'histogram', 'Time spent waiting for a pooled database connection, by bind', ('bind',)
+    ),
+    'fyyur_db_pool_checked_out_connections': (
+        'gauge', 'Database connections currently checked out, by bind', ('bind',)
+    ),
+    'fyyur_cache_hits_total': (
+        'counter', 'Entity cache lookups answered from the cache', ()
+    ),
+    'fyyur_cache_misses_total': (
+        'counter', 'Entity cache lookups that loaded from the database', ()
+    )
+}
+
+class Histogram:
+    """
+    Bucket counts and sum of observed values, for the BUCKETS bounds
+    """
+    __slots__ = ('counts', 'sum', 'lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return self.counts + [self.sum]
+
+    def reset(self):
+        # Called in a forked child too, which may have copied the lock held
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+def _key(*labels):
+    return json.dumps([str(label) for label in labels])
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, key, extra=()):
+    pairs = list(zip(names, json.loads(key))) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs) + '}'
+
+def _empty():
+    return {'counters': {}, 'histograms': {}, 'gauges': {}}
+
+def _add(total, snapshot):
+    """
+    Adds the counters, histograms and gauges of snapshot to total, a dict
+    of the same shape
+    """
+    for kind in ('counters', 'histograms', 'gauges'):
+        for name, series in snapshot[kind].items():
+            sums = total[kind].setdefault(name, {})
+            for key, value in series.items():
+                if kind == 'histograms':
+                    sums[key] = [a + b for a, b in zip(sums.get(key, [0] * len(value)), value)]
+                else:
+                    sums[key] = sums.get(key, 0) + value
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Metrics:
+    """
+    Collects this worker's metrics through request hooks and template
+    signals, and renders the totals of every worker
+    """
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.histograms = {'fyyur_http_request_duration_seconds': {}, 'fyyur_template_render_seconds': {}}
+        self.directory = None
+        self.flush_interval = 1.0
+        self.flushed = 0.0
+        self.engines = {}
+        self.cache = None
+        self._new_process()
+        if app is not None:
+            self.init_app(app)
+
+    def _new_process(self):
+        self.token = uuid.uuid4().hex
+        self.started = time.time()
+
+    def init_app(self, app):
+        self.directory = app.config.get('METRICS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            # A worker killed outright loses at most its last interval
+            atexit.register(self.flush)
+            # Workers forked from a preloaded app start their own totals
+            # under their own file
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._reset)
+        db = app.extensions.get('sqlalchemy')
+        if db is not None:
+            with app.app_context():
+                self.engines = dict(db.engines)
+        self.cache = app.extensions.get('entity_cache')
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['metrics'] = self
+
+    def _reset(self):
+        with self.lock:
+            self.requests = {}
+            self.histograms = {name: {} for name in self.histograms}
+        # The pools' and the cache's counts came with the fork too, and
+        # the parent reports them already
+        for engine in self.engines.values():
+            if hasattr(engine.pool, 'checkout_wait'):
+                engine.pool.checkout_wait.reset()
+        if self.cache is not None:
+            self.cache.hits = 0
+            self.cache.misses = 0
+        self._new_process()
+
+    def _observe(self, name, key, value):
+        histograms = self.histograms[name]
+        histogram = histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+
+    def _finish(self, response):
+        if 'metrics_started' not in g:
+            return response
+        # Unmatched URLs share one label, so 404 scans cannot grow the series
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        self._observe('fyyur_http_request_duration_seconds', _key(endpoint), time.perf_counter() - g.metrics_started)
+        key = _key(endpoint, request.method, response.status_code)
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+        if self.directory and time.monotonic() - self.flushed >= self.flush_interval:
+            self.flush()
+        return response
+
+    def _before_render(self, app, template, context, **extra):
+        g.template_started = time.perf_counter()
+
+    def _after_render(self, app, template, context, **extra):
+        started = g.pop('template_started', None)
+        if started is not None:
+            self._observe('fyyur_template_render_seconds', _key(template.name), time.perf_counter() - started)
+
+    def snapshot(self):
+        """
+        Returns this worker's totals as a JSON-serializable dict
+        """
+        with self.lock:
+            counters = {'fyyur_http_requests_total': dict(self.requests)}
+            histograms = {
+                name: {key: histogram.snapshot() for key, histogram in series.items()}
+                for name, series in self.histograms.items()
+            }
+        gauges = {'fyyur_db_pool_checked_out_connections': {}}
+        histograms['fyyur_db_pool_checkout_wait_seconds'] = {}
+        for bind, engine in self.engines.items():
+            key = _key(bind or 'primary')
+            if hasattr(engine.pool, 'checkedout'):
+                gauges['fyyur_db_pool_checked_out_connections'][key] = engine.pool.checkedout()
+            if hasattr(engine.pool, 'checkout_wait'):
+                histograms['fyyur_db_pool_checkout_wait_seconds'][key] = engine.pool.checkout_wait.snapshot()
+        if self.cache is not None:
+            counters['fyyur_cache_hits_total'] = {_key(): self.cache.hits}
+            counters['fyyur_cache_misses_total'] = {_key(): self.cache.misses}
+        return {
+            'pid': os.getpid(), 'token': self.token, 'started': self.started,
+            'counters': counters, 'histograms': histograms, 'gauges': gauges
+        }
+
+    def _path(self, pid, token):
+        return os.path.join(self.directory, 'worker-%d-%s.json' % (pid, token))
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A worker replacing its file; its totals are in the next scrape
+            return None
+
+    def _write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def flush(self):
+        """
+        Writes this worker's totals to METRICS_DIR, replacing its last file
+        """
+        self.flushed = time.monotonic()
+        self._write(self._path(os.getpid(), self.token), self.snapshot())
+
+    def _fold(self, exited, dead):
+        """
+        Adds the counters and histograms of the dead workers' snapshots to
+        exited, saves it and removes their files. exited lists the tokens
+        it holds whose files are not removed yet, so a fold interrupted
+        between the two is not counted twice
+        """
+        folded = set(exited['folded'])
+        for snapshot in dead:
+            if snapshot['token'] not in folded:
+                _add(exited, dict(snapshot, gauges={}))
+                folded.add(snapshot['token'])
+        exited['folded'] = sorted(folded)
+        self._write(os.path.join(self.directory, 'exited.json'), exited)
+        for snapshot in dead:
+            try:
+                os.remove(self._path(snapshot['pid'], snapshot['token']))
+            except FileNotFoundError:
+                pass
+
+    def _snapshots(self):
+        """
+        Returns the snapshots of the live workers and one summing the
+        workers that have exited
+        """
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        # Held while reading too, so no scrape sees a file folded but not
+        # yet added to exited.json
+        with open(os.path.join(self.directory, 'exited.lock'), 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+                snapshot = self._read(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+
+            # Of the files sharing a PID only the newest can be a live worker
+            newest = {}
+            for snapshot in snapshots:
+                if snapshot['started'] > newest.get(snapshot['pid'], (-1, None))[0]:
+                    newest[snapshot['pid']] = (snapshot['started'], snapshot['token'])
+            live, dead = [], []
+            for snapshot in snapshots:
+                current = newest[snapshot['pid']][1] == snapshot['token']
+                if current and (snapshot['pid'] == os.getpid() or _alive(snapshot['pid'])):
+                    live.append(snapshot)
+                else:
+                    dead.append(snapshot)
+
+            exited = self._read(os.path.join(self.directory, 'exited.json'))
+            if exited is None:
+                exited = dict(_empty(), folded=[])
+            # Tokens whose files are gone need no guarding any more
+            exited['folded'] = [
+                token for token in exited['folded']
+                if glob.glob(os.path.join(self.directory, 'worker-*-%s.json' % token))
+            ]
+            if dead:
+                self._fold(exited, dead)
+        return live + [exited]
+
+    def render(self):
+        """
+        Returns the totals of every worker in the Prometheus text format
+        """
+        total = _empty()
+        for snapshot in self._snapshots():
+            _add(total, snapshot)
+        totals = {name: {} for name in METRICS}
+        for series in total.values():
+            totals.update(series)
+
+        lines = []
+        for name, (kind, description, label_names) in METRICS.items():
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for key, value in sorted(totals[name].items()):
+                if kind != 'histogram':
+                    lines.append('%s%s %s' % (name, _labels(label_names, key), value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append('%s_bucket%s %d' % (name, _labels(label_names, key, [('le', str(bound))]), cumulative))
+                lines.append('%s_sum%s %s' % (name, _labels(label_names, key), value[-1]))
+                lines.append('%s_count%s %d' % (name, _labels(label_names, key), cumulative))
+        return '\n'.join(lines) + '\n'
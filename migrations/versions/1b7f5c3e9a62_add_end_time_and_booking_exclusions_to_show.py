@@ -0,0 +1,39 @@
+"""add end_time to Show and exclude overlapping bookings
+
+Revision ID: 1b7f5c3e9a62
+Revises: e5a03b8f91d7
+Create Date: 2026-10-17 15:37:44.120586
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7f5c3e9a62'
+down_revision = 'e5a03b8f91d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Show" SET end_time = start_time + interval \'2 hours\'')
+    op.alter_column('Show', 'end_time', nullable=False)
+
+    # Fails if existing shows already overlap; resolve those first
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE "Show" ADD CONSTRAINT "Show_venue_no_overlap" '
+        'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+    op.execute(
+        'ALTER TABLE "Show" ADD CONSTRAINT "Show_artist_no_overlap" '
+        'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+
+
+def downgrade():
+    op.drop_constraint('Show_artist_no_overlap', 'Show')
+    op.drop_constraint('Show_venue_no_overlap', 'Show')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,47 @@
+"""add search index to Venue and Artist
+
+Revision ID: 3f1c9e2b7d40
+Revises: bbdba8c38059
+Create Date: 2026-10-17 09:12:31.482117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9e2b7d40'
+down_revision = 'bbdba8c38059'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('Venue', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.add_column('Artist', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.create_index('ix_Venue_search_vector', 'Venue', ['search_vector'], postgresql_using='gin')
+    op.create_index('ix_Artist_search_vector', 'Artist', ['search_vector'], postgresql_using='gin')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+    # Index the rows that already exist
+    op.execute(
+        "UPDATE \"Venue\" SET search_vector = "
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')"
+    )
+    op.execute(
+        "UPDATE \"Artist\" SET search_vector = "
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
+    op.drop_index('ix_Artist_search_vector', table_name='Artist')
+    op.drop_index('ix_Venue_search_vector', table_name='Venue')
+    op.drop_column('Artist', 'search_vector')
+    op.drop_column('Venue', 'search_vector')
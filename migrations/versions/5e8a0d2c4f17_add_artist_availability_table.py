@@ -0,0 +1,70 @@
+"""add ArtistAvailability table
+
+Revision ID: 5e8a0d2c4f17
+Revises: 1b7f5c3e9a62
+Create Date: 2026-10-17 15:02:44.718320
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a0d2c4f17'
+down_revision = '1b7f5c3e9a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ArtistAvailability',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.SmallInteger(), nullable=False),
+    sa.Column('start_minute', sa.SmallInteger(), nullable=False),
+    sa.Column('end_minute', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'weekday', 'start_minute')
+    )
+    op.create_index(
+        'ix_ArtistAvailability_weekday_start_minute', 'ArtistAvailability',
+        ['weekday', 'start_minute', 'end_minute', 'artist_id'], unique=False
+    )
+    op.alter_column('Artist', 'available_hours', type_=sa.String(length=200), existing_nullable=True)
+
+    # The old format is "from-to" in whole hours, every day, with shows
+    # allowed to start up to the end of the "to" hour. Rewrite it in the new
+    # format, where the end is exclusive, and give artists without hours
+    # every day in full
+    connection = op.get_bind()
+    artists = connection.execute(sa.text('SELECT id, available_hours FROM "Artist"')).fetchall()
+    rows = []
+    for artist_id, hours in artists:
+        start, end = 0, 24 * 60
+        if hours:
+            available_from, available_to = [int(part) for part in hours.split('-')]
+            start, end = available_from * 60, min(available_to + 1, 24) * 60
+            connection.execute(
+                sa.text('UPDATE "Artist" SET available_hours = :hours WHERE id = :id'),
+                {'hours': '%d-%d' % (available_from, available_to + 1), 'id': artist_id}
+            )
+        rows += [
+            {'artist_id': artist_id, 'weekday': weekday, 'start_minute': start, 'end_minute': end}
+            for weekday in range(7)
+        ]
+    if rows:
+        op.bulk_insert(sa.table(
+            'ArtistAvailability',
+            sa.column('artist_id', sa.Integer), sa.column('weekday', sa.SmallInteger),
+            sa.column('start_minute', sa.SmallInteger), sa.column('end_minute', sa.SmallInteger)
+        ), rows)
+
+
+def downgrade():
+    # Only single daily windows survive the downgrade
+    op.execute(
+        'UPDATE "Artist" SET available_hours = NULL '
+        'WHERE available_hours IS NOT NULL AND length(available_hours) > 5'
+    )
+    op.alter_column('Artist', 'available_hours', type_=sa.String(length=5), existing_nullable=True)
+    op.drop_index('ix_ArtistAvailability_weekday_start_minute', table_name='ArtistAvailability')
+    op.drop_table('ArtistAvailability')
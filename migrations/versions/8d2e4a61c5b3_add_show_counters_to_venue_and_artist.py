@@ -0,0 +1,38 @@
+"""add show counters to Venue and Artist
+
+Revision ID: 8d2e4a61c5b3
+Revises: 3f1c9e2b7d40
+Create Date: 2026-10-17 10:03:52.917304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4a61c5b3'
+down_revision = '3f1c9e2b7d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Venue', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Count the shows that already exist
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(
+            'UPDATE "{0}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id AND start_time >= now()), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id AND start_time < now())'.format(table, column)
+        )
+
+
+def downgrade():
+    op.drop_column('Artist', 'past_shows_count')
+    op.drop_column('Artist', 'upcoming_shows_count')
+    op.drop_column('Venue', 'past_shows_count')
+    op.drop_column('Venue', 'upcoming_shows_count')
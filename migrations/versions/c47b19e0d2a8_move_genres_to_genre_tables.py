@@ -0,0 +1,63 @@
+"""move genres to VenueGenre and ArtistGenre tables
+
+Revision ID: c47b19e0d2a8
+Revises: 8d2e4a61c5b3
+Create Date: 2026-10-17 11:26:08.301954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47b19e0d2a8'
+down_revision = '8d2e4a61c5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('VenueGenre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre')
+    )
+    op.create_index('ix_VenueGenre_genre_venue_id', 'VenueGenre', ['genre', 'venue_id'], unique=False)
+    op.create_table('ArtistGenre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre')
+    )
+    op.create_index('ix_ArtistGenre_genre_artist_id', 'ArtistGenre', ['genre', 'artist_id'], unique=False)
+
+    # The old columns hold Postgres array literals such as {Jazz,"Rock n Roll"}
+    op.execute(
+        'INSERT INTO "VenueGenre" (venue_id, genre) '
+        'SELECT DISTINCT id, unnest(genres::text[]) FROM "Venue" WHERE genres LIKE \'{%}\''
+    )
+    op.execute(
+        'INSERT INTO "ArtistGenre" (artist_id, genre) '
+        'SELECT DISTINCT id, unnest(genres::text[]) FROM "Artist" WHERE genres LIKE \'{%}\''
+    )
+    op.execute('DELETE FROM "VenueGenre" WHERE genre = \'\'')
+    op.execute('DELETE FROM "ArtistGenre" WHERE genre = \'\'')
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.execute(
+        'UPDATE "Venue" SET genres = (SELECT array_agg(genre)::text FROM "VenueGenre" WHERE venue_id = "Venue".id)'
+    )
+    op.execute(
+        'UPDATE "Artist" SET genres = (SELECT array_agg(genre)::text FROM "ArtistGenre" WHERE artist_id = "Artist".id)'
+    )
+    op.drop_index('ix_ArtistGenre_genre_artist_id', table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index('ix_VenueGenre_genre_venue_id', table_name='VenueGenre')
+    op.drop_table('VenueGenre')
@@ -0,0 +1,44 @@
+"""add version and updated_at to Venue and Artist, index Show start times
+
+Revision ID: e5a03b8f91d7
+Revises: c47b19e0d2a8
+Create Date: 2026-10-17 13:48:20.665213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a03b8f91d7'
+down_revision = 'c47b19e0d2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('Venue', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('Artist', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('Artist', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Venue" SET updated_at = coalesce(date_added, timezone(\'utc\', now()))')
+    op.execute('UPDATE "Artist" SET updated_at = coalesce(date_added, timezone(\'utc\', now()))')
+    op.alter_column('Venue', 'updated_at', nullable=False)
+    op.alter_column('Artist', 'updated_at', nullable=False)
+    op.create_index(op.f('ix_Venue_updated_at'), 'Venue', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_Artist_updated_at'), 'Artist', ['updated_at'], unique=False)
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time', 'Show', ['start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_index(op.f('ix_Artist_updated_at'), table_name='Artist')
+    op.drop_index(op.f('ix_Venue_updated_at'), table_name='Venue')
+    op.drop_column('Artist', 'updated_at')
+    op.drop_column('Artist', 'version')
+    op.drop_column('Venue', 'updated_at')
+    op.drop_column('Venue', 'version')
@@ -1,13 +1,150 @@
+import datetime
+import time
+import click
+from flask import current_app, g, request, has_request_context, session as cookie_session
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+import availability
+from metrics import Histogram
 
-db = SQLAlchemy()
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# With DATABASE_REPLICA_URL set the replica is bound as 'replica' and GET
+# and HEAD requests read from it; flushes, writes and every other request
+# use the primary. A request that may have written makes the client read
+# from the primary for REPLICA_STICKY_SECONDS, longer than the replica
+# lags, so it sees its own writes on the page it is redirected to.
+#----------------------------------------------------------------------------#
+
+REPLICA_BIND = 'replica'
+STICKY_KEY = '_primary_until'
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and _reading_replica():
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _reading_replica():
+    return has_request_context() and g.get('read_replica', False)
+
+def _choose_bind():
+    g.read_replica = (
+        request.method in ('GET', 'HEAD') and cookie_session.get(STICKY_KEY, 0) < time.time()
+    )
+
+def _stick_to_primary(response):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        cookie_session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# How long a show books its artist and venue when no duration is given,
+# and the longest booking accepted
+DEFAULT_SHOW_DURATION = datetime.timedelta(hours=2)
+MAX_SHOW_DURATION = datetime.timedelta(hours=24)
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waits for a connection
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_wait = self.checkout_wait
+        return pool
+
+def engine_options(config, uri=None):
+    """
+    Returns the SQLAlchemy engine options for the DB_* settings of config,
+    for uri or by default the primary database
+    """
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if url.get_backend_name() == 'sqlite':
+        # In-memory databases live on one connection, so get no pool sizing,
+        # and SQLite has no statement timeout; timeout is how long a writer
+        # waits for the database lock
+        options['connect_args'] = {'timeout': config['DB_CONNECT_TIMEOUT']}
+        if url.database in (None, '', ':memory:'):
+            return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE']
+    )
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {'connect_timeout': config['DB_CONNECT_TIMEOUT']}
+        if config['DB_STATEMENT_TIMEOUT']:
+            connect_args['options'] = '-c statement_timeout=%d' % (config['DB_STATEMENT_TIMEOUT'] * 1000)
+        options['connect_args'] = connect_args
+    return options
+
+def pool_stats(engine):
+    """
+    Returns the size and checked in, checked out and overflow connection
+    counts of engine's pool, as far as its pool class reports them
+    """
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    if hasattr(pool, 'timeout'):
+        stats['timeout'] = pool.timeout()
+    return stats
+
+def _database_url(uri):
+    # Postgres URLs from hosting providers often use the old postgres://
+    # scheme, which SQLAlchemy no longer accepts
+    if uri.startswith('postgres://'):
+        return 'postgresql+psycopg2://' + uri[len('postgres://'):]
+    return uri
 
 def setup_db(app):
-    app.config.from_object('config')
+    """
+    Binds the database to app, configured by its DATABASE_URL and DB_*
+    settings
+    """
+    app.config['SQLALCHEMY_DATABASE_URI'] = _database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+    replica = app.config.get('DATABASE_REPLICA_URL')
+    if replica:
+        replica = _database_url(replica)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(REPLICA_BIND, dict(engine_options(app.config, replica), url=replica))
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.before_request(_choose_bind)
+        app.after_request(_stick_to_primary)
+
     db.app = app
     db.init_app(app)
-    Migrate(app, db)
+    # Alembic takes longer to import than the rest of the app, and only the
+    # flask db commands use it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
     return db
 
 #----------------------------------------------------------------------------#
@@ -23,15 +160,28 @@ class Venue(db.Model):
     state = db.Column(db.String(2), nullable=False)
     address = db.Column(db.String(120), unique=True, nullable=False)
     phone = db.Column(db.String(120), unique=True, nullable=False)
-    genres = db.Column(db.String(120), nullable=True)
     image_link = db.Column(db.String(500), nullable=True)    
     website_link = db.Column(db.String(500), nullable=True)    
     facebook_link = db.Column(db.String(500), nullable=True)
     seeking_talent = db.Column(db.Boolean, nullable=True)
     seeking_description = db.Column(db.String(500), nullable=True)
     date_added = db.Column(db.DateTime, nullable=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
 
     venue_shows = db.relationship('Show', back_populates='venue', lazy=True)       
+    genre_rows = db.relationship('VenueGenre', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
+
+    @property
+    def genres(self):
+        return [row.genre for row in self.genre_rows]
+
+    @genres.setter
+    def genres(self, genres):
+        existing = {row.genre: row for row in self.genre_rows}
+        self.genre_rows = [existing.get(genre) or VenueGenre(genre=genre) for genre in dict.fromkeys(genres or [])]
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
@@ -41,25 +191,218 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=True)
     state = db.Column(db.String(2), nullable=True)
     phone = db.Column(db.String(120), unique=True, nullable=False)
-    genres = db.Column(db.String(120), nullable=True)
     image_link = db.Column(db.String(500), nullable=True)
     website_link = db.Column(db.String(500), nullable=True)
     facebook_link = db.Column(db.String(500), nullable=True)
     seeking_venue = db.Column(db.Boolean, nullable=True)
     seeking_description = db.Column(db.String(500), nullable=True) 
     date_added = db.Column(db.DateTime, nullable=False)
-    available_hours = db.Column(db.String(5), nullable=True)
+    # The availability text as entered; availability_rows hold it parsed
+    _available_hours = db.Column('available_hours', db.String(200), nullable=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
 
     artist_shows = db.relationship('Show', back_populates='artist', lazy=True)
+    genre_rows = db.relationship('ArtistGenre', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
+
+    @property
+    def genres(self):
+        return [row.genre for row in self.genre_rows]
+
+    @genres.setter
+    def genres(self, genres):
+        existing = {row.genre: row for row in self.genre_rows}
+        self.genre_rows = [existing.get(genre) or ArtistGenre(genre=genre) for genre in dict.fromkeys(genres or [])]
+
+    def __init__(self, **kwargs):
+        # Parse even when no availability is given, for the ALWAYS rows
+        kwargs.setdefault('available_hours', None)
+        super().__init__(**kwargs)
+
+    availability_rows = db.relationship(
+        'ArtistAvailability', cascade='all, delete-orphan', passive_deletes=True, lazy=True
+    )
+
+    def _get_available_hours(self):
+        return self._available_hours
+
+    def _set_available_hours(self, text):
+        existing = {(row.weekday, row.start_minute): row for row in self.availability_rows}
+        rows = []
+        for weekday, start, end in availability.parse(text):
+            row = existing.get((weekday, start)) or ArtistAvailability(weekday=weekday, start_minute=start)
+            row.end_minute = end
+            rows.append(row)
+        self.availability_rows = rows
+        self._available_hours = text or None
+
+    available_hours = db.synonym(
+        '_available_hours', descriptor=property(_get_available_hours, _set_available_hours)
+    )
 
 class Show(db.Model):
   __tablename__ = 'Show'
+  __table_args__ = (
+    db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_Show_start_time', 'start_time')
+  )
   
   id = db.Column(db.Integer, primary_key=True)
   venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
   artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
   
   start_time = db.Column(db.DateTime, nullable=False)
+  # On Postgres exclusion constraints keep shows of one venue, and of one
+  # artist, from overlapping (see conflicts.py)
+  end_time = db.Column(
+    db.DateTime, nullable=False,
+    default=lambda context: context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+  )
 
   venue = db.relationship('Venue', back_populates='venue_shows')
-  artist = db.relationship('Artist', back_populates='artist_shows')
\ No newline at end of file
+  artist = db.relationship('Artist', back_populates='artist_shows')
+
+# Genres live in one row per (entity, genre); the (genre, entity) index
+# answers genre filters with an index lookup
+class VenueGenre(db.Model):
+    __tablename__ = 'VenueGenre'
+    __table_args__ = (db.Index('ix_VenueGenre_genre_venue_id', 'genre', 'venue_id'),)
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(db.String(50), primary_key=True)
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'ArtistGenre'
+    __table_args__ = (db.Index('ix_ArtistGenre_genre_artist_id', 'genre', 'artist_id'),)
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(db.String(50), primary_key=True)
+
+# One row per window of a day an artist can start a show in, minutes
+# counted from midnight; the (weekday, start, end, artist) index answers
+# "who is free at" with an index range scan. Artists without availability
+# get every day in full (see availability.ALWAYS) so they need no special case
+class ArtistAvailability(db.Model):
+    __tablename__ = 'ArtistAvailability'
+    __table_args__ = (
+        db.Index('ix_ArtistAvailability_weekday_start_minute', 'weekday', 'start_minute', 'end_minute', 'artist_id'),
+    )
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    weekday = db.Column(db.SmallInteger, primary_key=True)
+    start_minute = db.Column(db.SmallInteger, primary_key=True)
+    end_minute = db.Column(db.SmallInteger, nullable=False)
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#
+# Venue and Artist carry denormalized upcoming/past show counts so listings
+# and search never touch the Show table. Inserts and deletes adjust them in
+# the same transaction; sweep_show_counters() moves shows that have since
+# started from upcoming to past and should run periodically.
+#----------------------------------------------------------------------------#
+
+def _adjust_show_counters(connection, show, delta):
+    column = 'upcoming_shows_count' if show.start_time >= datetime.datetime.now() else 'past_shows_count'
+    for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        table = model.__table__
+        connection.execute(
+            table.update().where(table.c.id == entity_id).values({
+                column: table.c[column] + delta,
+                # The show list is part of the entity's page
+                'version': table.c.version + 1,
+                'updated_at': datetime.datetime.utcnow()
+            })
+        )
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+    _adjust_show_counters(connection, show, 1)
+
+@event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, show):
+    _adjust_show_counters(connection, show, -1)
+
+def _recount_show_counters(model, show_fk, condition, now, **values):
+    table = model.__table__
+    upcoming = select(func.count(Show.id)).where(show_fk == table.c.id, Show.start_time >= now).scalar_subquery()
+    past = select(func.count(Show.id)).where(show_fk == table.c.id, Show.start_time < now).scalar_subquery()
+    update = table.update().values(upcoming_shows_count=upcoming, past_shows_count=past, **values)
+    if condition is not None:
+        update = update.where(condition(table))
+    db.session.execute(update)
+
+def sweep_show_counters(since=None, now=None):
+    """
+    Recounts the upcoming and past shows of every Venue and Artist with a
+    show starting between since and now, or of all of them when since is
+    None. Recounting rather than shifting makes overlapping sweeps safe
+    """
+    if now is None:
+        now = datetime.datetime.now()
+
+    for model, show_fk in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        condition = None
+        if since is not None:
+            started = select(show_fk).where(Show.start_time >= since, Show.start_time < now)
+            condition = lambda table: table.c.id.in_(started)
+        _recount_show_counters(model, show_fk, condition, now)
+
+def recount_show_counters(venue_ids=(), artist_ids=(), now=None):
+    """
+    Recounts the shows of the given Venues and Artists and bumps their
+    version, for writes that add shows without going through the ORM
+    """
+    if now is None:
+        now = datetime.datetime.now()
+
+    for model, show_fk, ids in ((Venue, Show.venue_id, venue_ids), (Artist, Show.artist_id, artist_ids)):
+        if ids:
+            _recount_show_counters(
+                model, show_fk, lambda table: table.c.id.in_(list(ids)), now,
+                version=model.__table__.c.version + 1, updated_at=datetime.datetime.utcnow()
+            )
+
+#----------------------------------------------------------------------------#
+# Versioning.
+#
+# Venue and Artist carry a version and an updated_at that change whenever
+# anything on their detail page does: their own columns or genres, their
+# shows (see _adjust_show_counters) or the name or image of a counterpart
+# they have shows with. Conditional GET handling builds validators on them.
+#----------------------------------------------------------------------------#
+
+def _bump_version(target):
+    target.version = (target.version or 0) + 1
+    target.updated_at = datetime.datetime.utcnow()
+
+def _bump_counterparts(connection, target, counterpart, show_fk, counterpart_fk):
+    state = db.inspect(target)
+    if not (state.attrs.name.history.has_changes() or state.attrs.image_link.history.has_changes()):
+        return
+    table = counterpart.__table__
+    connection.execute(
+        table.update().where(
+            table.c.id.in_(select(counterpart_fk).where(show_fk == target.id))
+        ).values(version=table.c.version + 1, updated_at=datetime.datetime.utcnow())
+    )
+
+@event.listens_for(Venue, 'before_update')
+def version_updated_venue(mapper, connection, venue):
+    _bump_version(venue)
+
+@event.listens_for(Artist, 'before_update')
+def version_updated_artist(mapper, connection, artist):
+    _bump_version(artist)
+
+@event.listens_for(Venue, 'after_update')
+def version_venue_artists(mapper, connection, venue):
+    _bump_counterparts(connection, venue, Artist, Show.venue_id, Show.artist_id)
+
+@event.listens_for(Artist, 'after_update')
+def version_artist_venues(mapper, connection, artist):
+    _bump_counterparts(connection, artist, Venue, Show.artist_id, Show.venue_id)
+
@@ -0,0 +1,410 @@
+import base64
+import datetime
+import hashlib
+import json
+from sqlalchemy import func, false, select, tuple_
+from models import db, Venue, Artist, Show, VenueGenre, ArtistGenre, ArtistAvailability, DEFAULT_SHOW_DURATION
+from availability import minute_of_week
+from conflicts import overlaps
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(key):
+    """
+    Encodes the sort key of a row as an opaque, URL-safe cursor
+    """
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in key]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, types):
+    """
+    Decodes a cursor made by encode_cursor back into a sort key, converting
+    each value with the matching callable in types. Raises ValueError if the
+    cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            raise ValueError('wrong cursor length')
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor: ' + str(e))
+
+def paginate(query, key_columns, key, after=None, before=None, per_page=50):
+    """
+    Returns one page of query ordered by key_columns, seeking past the sort
+    key given in after (or before, when paging backwards) instead of using
+    OFFSET, so every page costs the same regardless of its position. key
+    extracts the sort key from a result row
+    """
+    columns = tuple_(*key_columns)
+    if before is not None:
+        query = query.filter(columns < tuple_(*before)).order_by(*[column.desc() for column in key_columns])
+    else:
+        if after is not None:
+            query = query.filter(columns > tuple_(*after))
+        query = query.order_by(*key_columns)
+
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, after is not None
+
+    return {
+        'items': rows,
+        'next_cursor': encode_cursor(key(rows[-1])) if rows and has_next else None,
+        'prev_cursor': encode_cursor(key(rows[0])) if rows and has_prev else None
+    }
+
+#----------------------------------------------------------------------------#
+# Listing queries.
+#----------------------------------------------------------------------------#
+
+VENUE_KEY = (str, str, str, int)
+ARTIST_KEY = (str, int)
+SHOW_KEY = (datetime.datetime.fromisoformat, int)
+
+def venue_areas(genres=None, after=None, before=None, per_page=50):
+    """
+    Returns a page of the geographical areas for which we have Venues, each
+    with its venues and their number of upcoming shows. The whole tree comes
+    from one query over Venue, read in (state, city, name, id) order and
+    assembled in one pass. When genres are given only venues playing any of
+    them are listed
+    """
+    rows = db.session.query(
+        Venue.state, Venue.city, Venue.id, Venue.name, Venue.upcoming_shows_count
+    )
+    if genres:
+        rows = rows.filter(Venue.id.in_(
+            db.session.query(VenueGenre.venue_id).filter(VenueGenre.genre.in_(genres))
+        ))
+    page = paginate(
+        rows, (Venue.state, Venue.city, Venue.name, Venue.id),
+        lambda row: (row[0], row[1], row[3], row[2]),
+        after, before, per_page
+    )
+
+    areas = []
+    for state, city, venue_id, name, upcoming in page['items']:
+        if not areas or (areas[-1]['state'], areas[-1]['city']) != (state, city):
+            areas.append({
+                'city': city,
+                'state': state,
+                'venues': []
+            })
+        areas[-1]['venues'].append({
+            'id': venue_id,
+            'name': name,
+            'num_upcoming_shows': upcoming
+        })
+
+    page['items'] = areas
+    return page
+
+def artists_page(genres=None, after=None, before=None, per_page=50):
+    """
+    Returns a page of artist IDs and names keyed on (name, id). When genres
+    are given only artists playing any of them are listed
+    """
+    query = db.session.query(Artist.id, Artist.name)
+    if genres:
+        query = query.filter(Artist.id.in_(
+            db.session.query(ArtistGenre.artist_id).filter(ArtistGenre.genre.in_(genres))
+        ))
+    return paginate(
+        query, (Artist.name, Artist.id), lambda row: (row.name, row.id),
+        after, before, per_page
+    )
+
+def _available_at(at):
+    weekday, minute = minute_of_week(at)
+    return db.session.query(ArtistAvailability.artist_id).filter(
+        ArtistAvailability.weekday == weekday,
+        ArtistAvailability.start_minute <= minute,
+        ArtistAvailability.end_minute > minute
+    )
+
+def artist_available(artist_id, at):
+    """
+    Returns whether at falls in one of the artist's availability windows
+    """
+    return db.session.query(_available_at(at).filter(ArtistAvailability.artist_id == artist_id).exists()).scalar()
+
+def available_artists(at, duration=DEFAULT_SHOW_DURATION, genres=None, limit=None):
+    """
+    Returns the IDs, names and upcoming show counts of the artists who can
+    start a show at at and have no show overlapping [at, at + duration),
+    by name. When genres are given only artists playing any of them are
+    listed
+    """
+    booked = db.session.query(Show.artist_id).filter(overlaps(at, at + duration))
+    query = db.session.query(
+        Artist.id, Artist.name, Artist.upcoming_shows_count
+    ).filter(
+        Artist.id.in_(_available_at(at)),
+        ~Artist.id.in_(booked)
+    )
+    if genres:
+        query = query.filter(Artist.id.in_(
+            db.session.query(ArtistGenre.artist_id).filter(ArtistGenre.genre.in_(genres))
+        ))
+    return query.order_by(Artist.name, Artist.id).limit(limit).all()
+
+def upcoming_shows(after=None, before=None, per_page=50, now=None):
+    """
+    Returns a page of upcoming shows, joined to their venue and artist,
+    keyed on (start_time, id)
+    """
+    if now is None:
+        now = datetime.datetime.now()
+
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(
+        Venue, Venue.id == Show.venue_id
+    ).join(
+        Artist, Artist.id == Show.artist_id
+    ).filter(
+        Show.start_time >= now
+    )
+    page = paginate(
+        query, (Show.start_time, Show.id), lambda row: (row.start_time, row.id),
+        after, before, per_page
+    )
+
+    page['items'] = [{
+        'venue_id': show.venue_id,
+        'venue_name': show.venue_name,
+        'artist_id': show.artist_id,
+        'artist_name': show.artist_name,
+        'artist_image_link': show.artist_image_link,
+        'start_time': show.start_time
+    } for show in page['items']]
+    return page
+
+#----------------------------------------------------------------------------#
+# Detail queries.
+#----------------------------------------------------------------------------#
+
+def _detail(entity, entity_id, show_fk, counterpart, counterpart_fk, prefix, past_limit, now):
+    """
+    Loads one Venue or Artist and its shows joined to the counterpart's name
+    and image. The entity and its past/upcoming counts come from one grouped
+    query, the shows from a second; past shows beyond past_limit (most recent
+    first) are dropped in SQL rather than materialized
+    """
+    if now is None:
+        now = datetime.datetime.now()
+
+    row = db.session.query(
+        entity,
+        func.count(Show.id).filter(Show.start_time < now),
+        func.count(Show.id).filter(Show.start_time >= now)
+    ).outerjoin(
+        Show, show_fk == entity.id
+    ).group_by(
+        entity.id
+    ).filter(
+        entity.id == entity_id
+    ).first()
+    if row is None:
+        return None
+    record, past_count, upcoming_count = row
+
+    is_past = (Show.start_time < now).label('is_past')
+    shows = db.session.query(
+        counterpart_fk.label('counterpart_id'),
+        Show.start_time.label('start_time'),
+        counterpart.name.label('counterpart_name'),
+        counterpart.image_link.label('counterpart_image_link'),
+        is_past
+    ).join(
+        counterpart, counterpart.id == counterpart_fk
+    ).filter(
+        show_fk == record.id
+    )
+    if past_limit is not None:
+        rank = func.row_number().over(partition_by=is_past, order_by=Show.start_time.desc())
+        ranked = shows.add_columns(rank.label('rank')).subquery()
+        shows = db.session.query(
+            ranked.c.counterpart_id,
+            ranked.c.start_time,
+            ranked.c.counterpart_name,
+            ranked.c.counterpart_image_link,
+            ranked.c.is_past
+        ).filter(
+            (ranked.c.is_past == false()) | (ranked.c.rank <= past_limit)
+        ).order_by(ranked.c.start_time)
+    else:
+        shows = shows.order_by(Show.start_time)
+
+    past_shows = []
+    upcoming_shows = []
+    for counterpart_id, start_time, name, image_link, past in shows:
+        this_show = {
+            prefix + '_id': counterpart_id,
+            prefix + '_name': name,
+            prefix + '_image_link': image_link,
+            'start_time': start_time
+        }
+        if past:
+            past_shows.append(this_show)
+        else:
+            upcoming_shows.append(this_show)
+    past_shows.reverse()
+
+    return record, {
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': past_count,
+        'upcoming_shows_count': upcoming_count
+    }
+
+def venue_detail(venue_id, past_limit=None, now=None):
+    """
+    Returns the data dict for the venue details page, or None if there is
+    no venue with the given ID
+    """
+    loaded = _detail(Venue, venue_id, Show.venue_id, Artist, Show.artist_id, 'artist', past_limit, now)
+    if loaded is None:
+        return None
+    venue, shows = loaded
+
+    data = {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': venue.genres,
+        'city': venue.city,
+        'state': venue.state,
+        'address': venue.address,
+        'phone': venue.phone,
+        'website_link': venue.website_link,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'seeking_description': venue.seeking_description,
+        'image_link': venue.image_link
+    }
+    data.update(shows)
+    return data
+
+def artist_detail(artist_id, past_limit=None, now=None):
+    """
+    Returns the data dict for the artist details page, or None if there is
+    no artist with the given ID
+    """
+    loaded = _detail(Artist, artist_id, Show.artist_id, Venue, Show.venue_id, 'venue', past_limit, now)
+    if loaded is None:
+        return None
+    artist, shows = loaded
+
+    data = {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': artist.genres,
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website_link': artist.website_link,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venue,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link
+    }
+    data.update(shows)
+    return data
+
+def venue_artist_ids(venue_id):
+    """
+    Returns the IDs of the artists with a show at the given venue
+    """
+    return [row[0] for row in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+def artist_venue_ids(artist_id):
+    """
+    Returns the IDs of the venues with a show by the given artist
+    """
+    return [row[0] for row in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+#----------------------------------------------------------------------------#
+# Validators.
+#
+# Cheap queries answering whether a page changed, used for conditional GET
+# before any page data is loaded. A page also changes when one of its shows
+# starts and moves from upcoming to past, so the validators include the
+# next show start and the latest one already passed.
+#----------------------------------------------------------------------------#
+
+def _as_utc(value, local=False):
+    if value is None:
+        return None
+    if local:
+        return value.astimezone(datetime.timezone.utc)
+    return value.replace(tzinfo=datetime.timezone.utc)
+
+def _validators(tag, version, updated_at, next_start, last_start):
+    etag = hashlib.sha1(repr((tag, version, updated_at, next_start)).encode()).hexdigest()
+    last_modified = max(
+        moment for moment in (_as_utc(updated_at), _as_utc(last_start, local=True)) if moment is not None
+    )
+    return etag, last_modified
+
+def _entity_validators(entity, show_fk, entity_id, now):
+    if now is None:
+        now = datetime.datetime.now()
+
+    next_start = select(func.min(Show.start_time)).where(show_fk == entity.id, Show.start_time >= now)
+    last_start = select(func.max(Show.start_time)).where(show_fk == entity.id, Show.start_time < now)
+    row = db.session.query(
+        entity.version, entity.updated_at, next_start.scalar_subquery(), last_start.scalar_subquery()
+    ).filter(entity.id == entity_id).first()
+    if row is None:
+        return None
+    return _validators((entity.__tablename__, entity_id), *row)
+
+def venue_validators(venue_id, now=None):
+    """
+    Returns the (etag, last_modified) of a venue's details page, or None if
+    there is no venue with the given ID
+    """
+    return _entity_validators(Venue, Show.venue_id, venue_id, now)
+
+def artist_validators(artist_id, now=None):
+    """
+    Returns the (etag, last_modified) of an artist's details page, or None
+    if there is no artist with the given ID
+    """
+    return _entity_validators(Artist, Show.artist_id, artist_id, now)
+
+def shows_validators(now=None):
+    """
+    Returns the (etag, last_modified) of the upcoming shows listing. Adding
+    or deleting a show bumps its venue's updated_at, so the newest venue and
+    artist updates cover every change to the listing
+    """
+    if now is None:
+        now = datetime.datetime.now()
+
+    venue_updated, artist_updated, next_start, last_start = db.session.query(
+        select(func.max(Venue.updated_at)).scalar_subquery(),
+        select(func.max(Artist.updated_at)).scalar_subquery(),
+        select(func.min(Show.start_time)).where(Show.start_time >= now).scalar_subquery(),
+        select(func.max(Show.start_time)).where(Show.start_time < now).scalar_subquery()
+    ).one()
+    updated_at = max((moment for moment in (venue_updated, artist_updated) if moment is not None), default=None)
+    if updated_at is None:
+        updated_at = datetime.datetime(1970, 1, 1)
+    return _validators('Show', (venue_updated, artist_updated), updated_at, next_start, last_start)
@@ -0,0 +1,210 @@
+import difflib
+import re
+from sqlalchemy import DDL, bindparam, event, text
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Search index.
+#
+# Venues are searched on name, city and state, Artists on name. Postgres
+# keeps a weighted tsvector column on each table (GIN indexed) plus pg_trgm
+# indexes on name for typo tolerance; SQLite keeps one FTS5 table per model
+# whose rowid is the entity ID, created with the schema (or by 'flask
+# reindex' in databases made before). Any other database falls back to
+# ILIKE. The submission handlers call index_*/unindex_* inside their
+# transaction.
+#----------------------------------------------------------------------------#
+
+class PostgresSearch:
+    DOCUMENTS = {
+        'Venue': "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                 "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')",
+        'Artist': "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+    }
+
+    def index(self, table, entity_ids):
+        db.session.execute(
+            text('UPDATE "{0}" SET search_vector = {1} WHERE id IN :ids'.format(table, self.DOCUMENTS[table]))
+                .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(entity_ids)}
+        )
+
+    def unindex(self, table, entity_ids):
+        # The vector lives on the row itself and goes away with it
+        pass
+
+    def reindex(self, table):
+        db.session.execute(text('UPDATE "{0}" SET search_vector = {1}'.format(table, self.DOCUMENTS[table])))
+
+    def search(self, table, term, limit):
+        words = tokenize(term)
+        query = ' & '.join(word + ':*' for word in words)
+        return db.session.execute(text(
+            'SELECT id, name, upcoming_shows_count FROM "{0}", to_tsquery(\'simple\', :query) query '
+            'WHERE search_vector @@ query OR name % :term '
+            'ORDER BY ts_rank(search_vector, query) + similarity(name, :term) DESC, name '
+            'LIMIT :limit'.format(table)
+        ), {'query': query, 'term': term, 'limit': limit}).fetchall()
+
+
+class SQLiteSearch:
+    DOCUMENTS = {
+        'Venue': ('name', "city || ' ' || state"),
+        'Artist': ('name', "''")
+    }
+
+    @staticmethod
+    def fts_table(table):
+        return table.lower() + '_search'
+
+    @staticmethod
+    def create_statements(table):
+        fts = SQLiteSearch.fts_table(table)
+        return [
+            'CREATE VIRTUAL TABLE IF NOT EXISTS {0} USING fts5(name, place, tokenize="unicode61")'.format(fts),
+            'CREATE VIRTUAL TABLE IF NOT EXISTS {0}_vocab USING fts5vocab({0}, "row")'.format(fts)
+        ]
+
+    def index(self, table, entity_ids):
+        fts = self.fts_table(table)
+        name, place = self.DOCUMENTS[table]
+        self.unindex(table, entity_ids)
+        db.session.execute(text(
+            'INSERT INTO {0} (rowid, name, place) SELECT id, {1}, {2} FROM "{3}" WHERE id IN :ids'.format(fts, name, place, table)
+        ).bindparams(bindparam('ids', expanding=True)), {'ids': list(entity_ids)})
+
+    def unindex(self, table, entity_ids):
+        fts = self.fts_table(table)
+        db.session.execute(
+            text('DELETE FROM {0} WHERE rowid IN :ids'.format(fts)).bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(entity_ids)}
+        )
+
+    def reindex(self, table):
+        for statement in self.create_statements(table):
+            db.session.execute(text(statement))
+        fts = self.fts_table(table)
+        name, place = self.DOCUMENTS[table]
+        db.session.execute(text('DELETE FROM {0}'.format(fts)))
+        db.session.execute(text(
+            'INSERT INTO {0} (rowid, name, place) SELECT id, {1}, {2} FROM "{3}"'.format(fts, name, place, table)
+        ))
+
+    def _match(self, fts, table, words, limit):
+        query = ' '.join('"{0}"*'.format(word) for word in words)
+        return db.session.execute(text(
+            'SELECT e.id, e.name, e.upcoming_shows_count FROM {0} JOIN "{1}" e ON e.id = {0}.rowid '
+            'WHERE {0} MATCH :query ORDER BY bm25({0}, 10.0, 1.0), e.name LIMIT :limit'.format(fts, table)
+        ), {'query': query, 'limit': limit}).fetchall()
+
+    def search(self, table, term, limit):
+        fts = self.fts_table(table)
+        words = tokenize(term)
+        results = self._match(fts, table, words, limit)
+        if results:
+            return results
+
+        # Nothing matched: retry with each word swapped for its closest
+        # indexed terms, standing in for Postgres trigram similarity
+        vocabulary = [row[0] for row in db.session.execute(text('SELECT term FROM {0}_vocab'.format(fts)))]
+        corrected = []
+        for word in words:
+            close = difflib.get_close_matches(word, vocabulary, n=1, cutoff=0.7)
+            corrected.append(close[0] if close else word)
+        if corrected == words:
+            return results
+        return self._match(fts, table, corrected, limit)
+
+for _table in SQLiteSearch.DOCUMENTS:
+    for _statement in SQLiteSearch.create_statements(_table):
+        event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+
+class LikeSearch:
+    COLUMNS = {
+        'Venue': (Venue, (Venue.name, Venue.city, Venue.state)),
+        'Artist': (Artist, (Artist.name,))
+    }
+
+    def index(self, table, entity_ids):
+        pass
+
+    def unindex(self, table, entity_ids):
+        pass
+
+    def reindex(self, table):
+        pass
+
+    def search(self, table, term, limit):
+        model, columns = self.COLUMNS[table]
+        condition = None
+        for column in columns:
+            match = column.ilike('%' + term + '%')
+            condition = match if condition is None else condition | match
+        return db.session.query(model.id, model.name, model.upcoming_shows_count).filter(condition).order_by(model.name).limit(limit).all()
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SQLiteSearch
+}
+
+def backend():
+    """
+    Returns the search backend for the database the session is bound to
+    """
+    return BACKENDS.get(db.engine.dialect.name, LikeSearch)()
+
+def tokenize(term):
+    """
+    Splits a search term into the lower-cased words the index matches on
+    """
+    return re.findall(r'\w+', term.lower())
+
+#----------------------------------------------------------------------------#
+# Public interface.
+#----------------------------------------------------------------------------#
+
+def index_venue(venue_id):
+    backend().index('Venue', [venue_id])
+
+def index_artist(artist_id):
+    backend().index('Artist', [artist_id])
+
+def index_venues(venue_ids):
+    backend().index('Venue', venue_ids)
+
+def index_artists(artist_ids):
+    backend().index('Artist', artist_ids)
+
+def unindex_venue(venue_id):
+    backend().unindex('Venue', [venue_id])
+
+def reindex():
+    """
+    Rebuilds the search index for every Venue and Artist
+    """
+    search = backend()
+    search.reindex('Venue')
+    search.reindex('Artist')
+
+def _search(table, model, term, limit):
+    if not tokenize(term):
+        return db.session.query(model.id, model.name, model.upcoming_shows_count).order_by(model.name).limit(limit).all()
+    return backend().search(table, term, limit)
+
+def search_venues(term, limit=100):
+    """
+    Returns (id, name, upcoming_shows_count) rows for the Venues best
+    matching term, ranked by relevance. Words match as prefixes and near
+    misses are tolerated
+    """
+    return _search('Venue', Venue, term, limit)
+
+def search_artists(term, limit=100):
+    """
+    Returns (id, name, upcoming_shows_count) rows for the Artists best
+    matching term, ranked by relevance. Words match as prefixes and near
+    misses are tolerated
+    """
+    return _search('Artist', Artist, term, limit)
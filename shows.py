@@ -0,0 +1,147 @@
+import datetime
+import io
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from models import db, Show
+from conflicts import ConflictChecker, describe
+from views import page_args, conditional, stream_page
+from queries import upcoming_shows, artist_available, shows_validators, SHOW_KEY
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('shows', __name__)
+
+@blueprint.route('/shows')
+def shows():
+  # displays list of shows at /shows
+  # TODO: replace with real venues data.
+  #       num_shows should be aggregated based on number of upcoming shows per venue.
+  """
+  Returns shows.html and lists all shows in the database
+  """
+  args = page_args(SHOW_KEY)
+
+  def render():
+    page = upcoming_shows(**args)
+    return stream_page('pages/shows.html', shows=page['items'], page=page)
+
+  return conditional(shows_validators(), render)
+
+@blueprint.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  """
+  Received POSTed form data for a new show and saves those details in the database
+  Returns user to index.html
+  """
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  from forms import ShowForm
+
+  form = ShowForm()
+  if form.validate():
+    artist_id = form.artist_id.data
+    venue_id = form.venue_id.data
+    start_time = form.start_time.data
+
+    end_time = start_time + datetime.timedelta(minutes=form.duration.data or 120)
+    checker = ConflictChecker()
+    checker.load([artist_id], [venue_id], start_time, end_time)
+    conflicts = checker.conflicts(artist_id, venue_id, start_time, end_time)
+
+    # If show time falls in one of the Artist's availability windows (every time when none were given), try to list the show
+    if conflicts:
+      for kind, conflict in conflicts:
+        flash(describe(kind, conflict))
+    elif artist_available(artist_id, start_time):
+      try:
+        show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+        db.session.add(show)
+        db.session.commit()
+        current_app.extensions['entity_cache'].invalidate(venue_ids=[venue_id], artist_ids=[artist_id])
+        flash('Show was successfully listed!')
+        # TODO: insert form data as a new Venue record in the db, instead
+        # TODO: modify data to be the data object returned from db insertion
+      except Exception as e:
+        db.session.rollback()
+        flash('ERROR: Show not created!')
+      finally:
+        db.session.close()
+    else:
+      flash("Artist not avaiable at that time")
+
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Show could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return redirect(url_for('index'))
+
+@blueprint.route('/shows/batch')
+def create_show_batch():
+  from forms import ShowBatchForm
+  form = ShowBatchForm()
+  return render_template('forms/batch_shows.html', form=form, results=None)
+
+@blueprint.route('/shows/batch', methods=['POST'])
+def create_show_batch_submission():
+  """
+  Creates many shows at once from a JSON list of {artist_id, venue_id,
+  start_time, duration} objects, or from CSV rows POSTed with the batch
+  form. Rows are validated like the new show form and checked for
+  availability and conflicts against the database and each other; all valid
+  rows are written in one transaction. Responds with a result per row
+  """
+  import bulk
+  from forms import ShowBatchForm
+
+  if request.is_json:
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+      return jsonify({'error': 'Expected a JSON list of objects'}), 400
+    rows = list(enumerate(payload, 1))
+  else:
+    form = ShowBatchForm()
+    if not form.validate():
+      return render_template('forms/batch_shows.html', form=form, results=None)
+    rows = list(bulk.read_csv(io.StringIO(form.rows.data)))
+
+  max_rows = current_app.config['SHOW_BATCH_MAX_ROWS']
+  if len(rows) > max_rows:
+    error = 'At most %d shows can be created at once' % max_rows
+    if request.is_json:
+      return jsonify({'error': error}), 413
+    flash(error)
+    return render_template('forms/batch_shows.html', form=form, results=None), 413
+
+  # One batch for all rows, so they commit or roll back together
+  report = next(bulk.import_rows('shows', rows, batch_size=max(len(rows), 1)), None)
+  rejected = dict(report['rejected']) if report else {}
+  error = report['error'] if report else None
+  results = []
+  for number, _ in rows:
+    if number in rejected:
+      results.append({'line': number, 'status': 'rejected', 'errors': rejected[number]})
+    else:
+      results.append({'line': number, 'status': 'failed' if error else 'created', 'errors': {}})
+  if report:
+    current_app.extensions['entity_cache'].invalidate(venue_ids=report['venue_ids'], artist_ids=report['artist_ids'])
+
+  summary = {
+    'created': report['written'] if report else 0,
+    'rejected': len(rejected),
+    'error': error,
+    'results': results
+  }
+  if request.is_json:
+    return jsonify(summary), 500 if error else 200
+  if error:
+    flash('ERROR: No shows were created: ' + error)
+  else:
+    flash('%d shows were successfully listed, %d rejected' % (summary['created'], summary['rejected']))
+  return render_template('forms/batch_shows.html', form=form, results=summary)
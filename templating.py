@@ -0,0 +1,66 @@
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+
+#----------------------------------------------------------------------------#
+# Templates.
+#
+# Compiled templates are kept in a bytecode cache under
+# JINJA_BYTECODE_CACHE_DIR, shared by every worker on the machine and kept
+# across restarts, so a template is compiled once per change rather than
+# once per worker. With TEMPLATES_PRECOMPILE, create_app finishes by loading
+# every template: a server that builds the app before forking (gunicorn
+# --preload) hands its workers compiled templates, and the first request a
+# worker serves does not pay for them. 'flask templates compile' fills the
+# cache at deploy time.
+#----------------------------------------------------------------------------#
+
+TEMPLATE_EXTENSIONS = ('.html',)
+
+def setup_templates(app):
+    """
+    Configures app's Jinja environment from its TEMPLATES_* and JINJA_*
+    settings. Call it before anything uses app.jinja_env, which is created
+    on first use
+    """
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(directory))
+    app.cli.add_command(templates_cli)
+
+def template_names(app):
+    return sorted(name for name in app.jinja_env.list_templates() if name.endswith(TEMPLATE_EXTENSIONS))
+
+def precompile(app):
+    """
+    Loads every template of app, compiling those the bytecode cache does
+    not have, and returns (name, seconds) for each
+    """
+    timings = []
+    for name in template_names(app):
+        started = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings.append((name, time.perf_counter() - started))
+    return timings
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+templates_cli = AppGroup('templates', help='Compile the templates.')
+
+@templates_cli.command('compile')
+def compile_command():
+    """
+    Compiles every template into the bytecode cache
+    """
+    if not current_app.config.get('JINJA_BYTECODE_CACHE_DIR'):
+        raise click.ClickException('JINJA_BYTECODE_CACHE_DIR is not set, so there is no cache to fill')
+    timings = precompile(current_app)
+    for name, seconds in timings:
+        click.echo('%-32s %7.1f ms' % (name, seconds * 1000))
+    click.echo('%d templates in %.1f ms' % (len(timings), sum(seconds for _, seconds in timings) * 1000))
@@ -0,0 +1,59 @@
+import os
+import sys
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import SQLiteConfig
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def config(tmp_path):
+    class TestSQLiteConfig(SQLiteConfig):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'fyyur.db')
+        LOG_FILE = str(tmp_path / 'fyyur.log')
+        JINJA_BYTECODE_CACHE_DIR = None
+
+    return TestSQLiteConfig
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def run_queries(app):
+    """
+    Returns a function that makes a request with the test client and
+    returns its response and the SQL statements it executed
+    """
+    client = app.test_client()
+
+    def count(*args, **kwargs):
+        statements = []
+        listener = lambda *event_args: statements.append(event_args[2])
+        event.listen(db.engine, 'after_cursor_execute', listener)
+        try:
+            response = client.open(*args, **kwargs)
+            response.get_data()
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', listener)
+        return response, statements
+
+    return count
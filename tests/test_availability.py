@@ -0,0 +1,51 @@
+import datetime
+import pytest
+import availability
+from availability import ALWAYS, parse
+
+
+def test_empty_text_means_always_available():
+    assert parse('') == ALWAYS
+    assert parse('  ') == ALWAYS
+
+
+def test_windows_are_parsed_per_day():
+    assert parse('Mon-Wed 18-23; Sat,Sunday 12:00-23:30') == [
+        (0, 1080, 1380), (1, 1080, 1380), (2, 1080, 1380), (5, 720, 1410), (6, 720, 1410)
+    ]
+
+
+def test_day_ranges_wrap_around_the_week():
+    assert [day for day, _, _ in parse('Sat-Mon 20-22')] == [0, 5, 6]
+
+
+def test_windows_past_midnight_run_into_the_next_day():
+    assert parse('Sun 22-2') == [(0, 0, 120), (6, 1320, 1440)]
+    assert parse('Fri 20:30-24') == [(4, 1230, 1440)]
+
+
+def test_legacy_ranges_apply_to_every_day():
+    assert parse('18-24') == [(day, 1080, 1440) for day in range(7)]
+    assert parse('19-23') == [(day, 1140, 1380) for day in range(7)]
+
+
+def test_overlapping_windows_starting_together_keep_the_longest():
+    assert parse('Mon 18-20; Mon 18-23') == [(0, 1080, 1380)]
+
+
+@pytest.mark.parametrize('text', [
+    '24-0', '24-2', '25-3', '18-24:30', '18:60-20', 'Monkey 18-20', 'Mo 18-20', 'Mon-Funday 18-20',
+    'Mon', 'evenings', 'Mon 18-20; whenever'
+])
+def test_invalid_text_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse(text)
+
+
+def test_is_available_uses_half_open_windows():
+    windows = parse('Mon 18-20')
+    monday = datetime.datetime(2030, 10, 21)
+    assert availability.is_available(windows, monday.replace(hour=18))
+    assert availability.is_available(windows, monday.replace(hour=19, minute=59))
+    assert not availability.is_available(windows, monday.replace(hour=20))
+    assert not availability.is_available(windows, monday.replace(hour=18) + datetime.timedelta(days=1))
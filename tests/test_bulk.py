@@ -0,0 +1,43 @@
+import datetime
+import io
+import bulk
+from models import db, Show
+from test_shows import add_venue_and_artist
+
+
+def import_ndjson(app, text):
+    with app.test_request_context():
+        return list(bulk.import_rows('shows', bulk.read_ndjson(io.StringIO(text))))
+
+
+def test_ndjson_import_rejects_unreadable_lines_and_goes_on(app):
+    add_venue_and_artist()
+    reports = import_ndjson(app, '\n'.join([
+        '{"artist_id": 1, "venue_id": 1, "start_time": "2030-10-20 19:00"}',
+        '{"artist_id": 1, "venue_id": 1,',
+        '[1, 2]',
+        '{"artist_id": 1, "venue_id": 1, "start_time": "2030-10-21 19:00"}'
+    ]))
+    assert [report['written'] for report in reports] == [2]
+    (malformed, malformed_errors), (array, array_errors) = reports[0]['rejected']
+    assert malformed == 2 and malformed_errors['row'][0].startswith('Not valid JSON')
+    assert array == 3 and array_errors == {'row': ['Expected a JSON object, not list.']}
+    assert Show.query.count() == 2
+
+
+def test_exported_shows_import_again(app, client):
+    add_venue_and_artist()
+    start = datetime.datetime(2030, 10, 20, 19)
+    db.session.add(Show(artist_id=1, venue_id=1, start_time=start, end_time=start + datetime.timedelta(minutes=90)))
+    db.session.commit()
+    exported = client.get('/export/shows.ndjson').get_data(as_text=True)
+    assert '"start_time": "2030-10-20T19:00:00"' in exported
+
+    Show.query.delete()
+    db.session.commit()
+    reports = import_ndjson(app, exported)
+    assert reports[0]['written'] == 1 and reports[0]['rejected'] == []
+    show = Show.query.one()
+    assert (show.artist_id, show.venue_id, show.start_time, show.end_time) == (
+        1, 1, start, start + datetime.timedelta(minutes=90)
+    )
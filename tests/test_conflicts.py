@@ -0,0 +1,68 @@
+import datetime
+import random
+from conflicts import ConflictChecker, IntervalTree
+from models import db, Show
+from test_shows import add_venue_and_artist
+
+
+def test_interval_tree_matches_a_brute_force_overlap_check():
+    rng = random.Random(0)
+    tree = IntervalTree()
+    intervals = []
+    for number in range(500):
+        start = rng.randrange(1000)
+        interval = (start, start + rng.randrange(1, 50), number)
+        intervals.append(interval)
+        tree.insert(*interval)
+    assert len(tree) == len(intervals)
+
+    for _ in range(500):
+        start = rng.randrange(-20, 1050)
+        end = start + rng.randrange(1, 60)
+        expected = {value for low, high, value in intervals if low < end and start < high}
+        assert set(tree.overlapping(start, end)) == expected
+
+
+def test_interval_tree_intervals_that_only_touch_do_not_overlap():
+    tree = IntervalTree()
+    tree.insert(10, 20, 'booked')
+    assert tree.overlapping(20, 30) == []
+    assert tree.overlapping(0, 10) == []
+    assert tree.overlapping(19, 21) == ['booked']
+
+
+def test_checker_sees_loaded_shows_and_its_own_bookings(app):
+    add_venue_and_artist()
+    seven = datetime.datetime(2030, 10, 20, 19)
+    hours = lambda count: datetime.timedelta(hours=count)
+    db.session.add(Show(artist_id=1, venue_id=1, start_time=seven, end_time=seven + hours(2)))
+    db.session.commit()
+
+    checker = ConflictChecker()
+    checker.load([1], [1], seven - hours(12), seven + hours(12))
+    # A show starting as the loaded one ends is fine, one inside it is not
+    assert checker.conflicts(1, 1, seven + hours(2), seven + hours(4)) == []
+    assert [kind for kind, _ in checker.conflicts(1, 1, seven + hours(1), seven + hours(3))] == ['artist', 'venue']
+
+    checker.book(1, 1, seven + hours(2), seven + hours(4))
+    assert [kind for kind, _ in checker.conflicts(1, 2, seven + hours(3), seven + hours(5))] == ['artist']
+    assert [kind for kind, _ in checker.conflicts(2, 1, seven + hours(3), seven + hours(5))] == ['venue']
+    assert checker.conflicts(1, 1, seven + hours(4), seven + hours(6)) == []
+
+
+def test_batch_rows_conflict_with_each_other(client):
+    add_venue_and_artist()
+    response = client.post('/shows/batch', json=[
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2030-10-20 19:00', 'duration': 120},
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2030-10-20 21:00', 'duration': 60},
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2030-10-20 20:00', 'duration': 30}
+    ])
+    assert response.status_code == 200
+    first, adjacent, overlapping = response.get_json()['results']
+    assert first['status'] == adjacent['status'] == 'created'
+    assert overlapping['status'] == 'rejected'
+    assert overlapping['errors']['start_time'] == [
+        'The artist is already booked from 2030-10-20 19:00:00 to 2030-10-20 21:00:00.',
+        'The venue already has a show from 2030-10-20 19:00:00 to 2030-10-20 21:00:00.'
+    ]
+    assert Show.query.count() == 2
@@ -0,0 +1,34 @@
+import json
+import os
+from app import create_app
+from logs import QueueHandler
+
+
+def log_records(app):
+    # Stopping the writer flushes what is still queued
+    app.extensions['request_logging'].stop()
+    with open(app.config['LOG_FILE']) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_another_app_replaces_the_logger_handler(app, config):
+    second = create_app(config)
+    handlers = [handler for handler in app.logger.handlers if isinstance(handler, QueueHandler)]
+    assert handlers == [second.extensions['request_logging'].handler]
+    second.extensions['request_logging'].stop()
+
+
+def test_forked_worker_writes_its_records(app):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            app.test_client().get('/', headers={'X-Request-ID': 'from-the-child'})
+            app.extensions['request_logging'].stop()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    app.test_client().get('/', headers={'X-Request-ID': 'from-the-parent'})
+
+    records = log_records(app)
+    assert {'from-the-child', 'from-the-parent'} <= {record.get('request_id') for record in records}
+    assert any(record['level'] == 'WARNING' and 'LOG_ROTATION' in record['message'] for record in records)
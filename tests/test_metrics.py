@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+from app import create_app
+from metrics import BUCKETS, Metrics, _key
+from models import db
+from test_venues import add_venues
+
+
+def write_worker(directory, pid, token, started, requests):
+    with open(os.path.join(directory, 'worker-%d-%s.json' % (pid, token)), 'w') as f:
+        json.dump({
+            'pid': pid, 'token': token, 'started': started,
+            'counters': {'fyyur_http_requests_total': {_key('index', 'GET', 200): requests}},
+            'histograms': {},
+            'gauges': {'fyyur_db_pool_checked_out_connections': {_key('primary'): 1}}
+        }, f)
+
+
+def requests_total(text):
+    line = next(line for line in text.splitlines() if line.startswith('fyyur_http_requests_total{'))
+    return int(line.rsplit(' ', 1)[1])
+
+
+def test_exited_workers_are_folded_and_kept(tmp_path):
+    directory = str(tmp_path)
+    exited = subprocess.Popen([sys.executable, '-c', ''])
+    exited.wait()
+    write_worker(directory, exited.pid, 'a' * 32, 1.0, 5)
+    # An earlier process that had this one's PID
+    write_worker(directory, os.getpid(), 'b' * 32, 0.0, 7)
+
+    metrics = Metrics()
+    metrics.directory = directory
+    first = metrics.render()
+    assert requests_total(first) == 12
+    # Their gauges went with them
+    assert 'fyyur_db_pool_checked_out_connections{' not in first
+    assert sorted(os.listdir(directory)) == sorted(['exited.json', 'exited.lock', 'worker-%d-%s.json' % (os.getpid(), metrics.token)])
+
+    assert requests_total(metrics.render()) == 12
+
+
+def test_forked_worker_starts_its_own_totals(config, tmp_path):
+    class MetricsConfig(config):
+        METRICS_DIR = str(tmp_path / 'metrics')
+
+    app = create_app(MetricsConfig)
+    with app.app_context():
+        db.create_all()
+        add_venues(1)
+        db.session.remove()
+    metrics = app.extensions['metrics']
+    client = app.test_client()
+    for _ in range(2):
+        client.get('/api/v1/venues/1')
+    parent = metrics.snapshot()
+    assert parent['counters']['fyyur_cache_misses_total'][_key()] > 0
+    assert sum(parent['histograms']['fyyur_db_pool_checkout_wait_seconds'][_key('primary')][:-1]) > 0
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with os.fdopen(write, 'w') as f:
+                json.dump(metrics.snapshot(), f)
+        finally:
+            os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as f:
+        child = json.load(f)
+    os.waitpid(pid, 0)
+
+    assert child['token'] != parent['token']
+    assert child['counters']['fyyur_http_requests_total'] == {}
+    assert child['counters']['fyyur_cache_hits_total'] == {_key(): 0}
+    assert child['counters']['fyyur_cache_misses_total'] == {_key(): 0}
+    empty = [0] * (len(BUCKETS) + 1) + [0.0]
+    assert child['histograms']['fyyur_db_pool_checkout_wait_seconds'][_key('primary')] == empty
+    # The parent's own totals are untouched
+    assert metrics.snapshot()['counters']['fyyur_cache_misses_total'] == parent['counters']['fyyur_cache_misses_total']
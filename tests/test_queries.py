@@ -0,0 +1,56 @@
+import datetime
+import os
+import sys
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import db, Venue, Artist, Show
+from queries import venue_areas
+
+
+@pytest.fixture
+def database(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'fyyur.db')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+
+
+def add_venues(count, start=0):
+    artist = Artist(name='Artist %d' % start, phone='555-100-%04d' % start, date_added=datetime.datetime.utcnow())
+    db.session.add(artist)
+    for i in range(start, start + count):
+        venue = Venue(
+            name='Venue %d' % i, city='City %d' % (i % 7), state='CA', address='%d Main St' % i,
+            phone='555-000-%04d' % i, date_added=datetime.datetime.utcnow()
+        )
+        db.session.add(venue)
+        db.session.flush()
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.datetime.now() + datetime.timedelta(days=i + 1)))
+    db.session.commit()
+
+
+def count_statements(call):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'after_cursor_execute', listener)
+    try:
+        result = call()
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', listener)
+    return result, len(statements)
+
+
+def test_venue_areas_is_one_query_however_many_venues(database):
+    add_venues(3)
+    _, few = count_statements(venue_areas)
+
+    add_venues(40, start=3)
+    _, many = count_statements(venue_areas)
+    assert few == many == 1
@@ -0,0 +1,84 @@
+import datetime
+import time
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app import create_app
+from models import db, Venue, REPLICA_BIND
+
+
+def venue(name, venue_id=1):
+    return Venue(
+        id=venue_id, name=name, city='City', state='CA', address='%d Main St' % venue_id,
+        phone='555-000-%04d' % venue_id, date_added=datetime.datetime.utcnow()
+    )
+
+
+def venue_names(engine):
+    with engine.connect() as connection:
+        return set(connection.scalars(select(Venue.name)))
+
+
+@pytest.fixture
+def app(config, tmp_path):
+    class ReplicaConfig(config):
+        DATABASE_REPLICA_URL = 'sqlite:///' + str(tmp_path / 'replica.db')
+        REPLICA_STICKY_SECONDS = 0.5
+
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+        # The two files hold different rows, so each read shows where it went
+        db.session.add(venue('Primary Venue'))
+        db.session.commit()
+        with Session(db.engines[REPLICA_BIND]) as session:
+            session.add(venue('Replica Venue'))
+            session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        db.metadata.drop_all(db.engines[REPLICA_BIND])
+    # Flask-SQLAlchemy keeps a metadata per bind key it has seen, which
+    # would make create_all() look for the bind in the next test's app
+    db.metadatas.pop(REPLICA_BIND, None)
+
+
+def listed_names(client):
+    response = client.get('/api/v1/venues')
+    assert response.status_code == 200
+    return {row['name'] for row in response.get_json()['data']}
+
+
+def test_reads_go_to_the_replica_until_a_write(app):
+    client = app.test_client()
+    assert listed_names(client) == {'Replica Venue'}
+
+    response = client.post('/venues/create', data={
+        'name': 'New Venue', 'city': 'City', 'state': 'CA', 'address': '3 Main St',
+        'phone': '555-000-0003', 'genres': ['Jazz']
+    })
+    assert response.status_code == 302
+    assert venue_names(db.engines[None]) == {'Primary Venue', 'New Venue'}
+    assert venue_names(db.engines[REPLICA_BIND]) == {'Replica Venue'}
+
+    # The writer reads its own write from the primary for a while; other
+    # clients keep reading the replica
+    assert listed_names(client) == {'Primary Venue', 'New Venue'}
+    assert listed_names(app.test_client()) == {'Replica Venue'}
+
+    time.sleep(app.config['REPLICA_STICKY_SECONDS'] + 0.1)
+    assert listed_names(client) == {'Replica Venue'}
+
+
+def test_flushes_and_updates_in_a_get_go_to_the_primary(app):
+    with app.test_request_context('/venues'):
+        app.preprocess_request()
+        assert db.session.get_bind() is db.engines[REPLICA_BIND]
+        assert db.session.get_bind(clause=update(Venue)) is db.engines[None]
+
+        db.session.add(venue('Flushed Venue', 2))
+        db.session.flush()
+        db.session.commit()
+    assert venue_names(db.engines[None]) == {'Primary Venue', 'Flushed Venue'}
+    assert venue_names(db.engines[REPLICA_BIND]) == {'Replica Venue'}
@@ -0,0 +1,55 @@
+import datetime
+from models import db, Venue, Artist, Show
+
+
+def add_venue_and_artist():
+    now = datetime.datetime.utcnow()
+    db.session.add(Venue(name='Venue', city='City', state='CA', address='1 Main St', phone='555-000-0000', date_added=now))
+    db.session.add(Artist(name='Artist', phone='555-111-0000', date_added=now))
+    db.session.commit()
+
+
+def test_batch_reports_malformed_values_as_such(client):
+    response = client.post('/shows/batch', json=[
+        {'artist_id': 'x', 'venue_id': 1, 'start_time': '2030-01-01 20:00'},
+        {'artist_id': 1, 'venue_id': 1, 'start_time': 'tonight'},
+        {'venue_id': 1, 'start_time': '2030-01-01 20:00'}
+    ])
+    assert response.status_code == 200
+    malformed_id, malformed_time, missing = [result['errors'] for result in response.get_json()['results']]
+    assert malformed_id['artist_id'][0] == 'Not a valid integer value.'
+    assert malformed_time['start_time'][0].startswith('Not a valid datetime value, expected YYYY-MM-DD HH:MM')
+    assert missing['artist_id'] == ['This field is required.']
+
+
+def test_batch_accepts_iso_8601_start_times(app, client):
+    add_venue_and_artist()
+    response = client.post('/shows/batch', json=[
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2030-10-20T19:00:00'},
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2030-10-21T19:00'}
+    ])
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+    assert [show.start_time for show in Show.query.order_by(Show.start_time)] == [
+        datetime.datetime(2030, 10, 20, 19), datetime.datetime(2030, 10, 21, 19)
+    ]
+
+
+def test_not_modified_carries_the_headers_of_the_page(app, client):
+    add_venue_and_artist()
+    start = datetime.datetime.now() + datetime.timedelta(days=1)
+    db.session.add_all(
+        Show(artist_id=1, venue_id=1, start_time=start + datetime.timedelta(days=day)) for day in range(30)
+    )
+    db.session.commit()
+
+    for encoding in ('gzip', 'identity'):
+        page = client.get('/shows', headers={'Accept-Encoding': encoding})
+        assert page.status_code == 200 and page.get_data()
+        assert page.headers.get('Content-Encoding') == (encoding if encoding == 'gzip' else None)
+        not_modified = client.get('/shows', headers={
+            'Accept-Encoding': encoding, 'If-None-Match': page.headers['ETag']
+        })
+        assert not_modified.status_code == 304
+        assert not_modified.headers['ETag'] == page.headers['ETag']
+        assert not_modified.headers['Vary'] == page.headers['Vary']
@@ -0,0 +1,93 @@
+import datetime
+from sqlalchemy import update
+from models import db, Venue, VenueGenre, Artist, Show
+
+
+def add_venues(count, start=0):
+    for i in range(start, start + count):
+        db.session.add(Venue(
+            name='Venue %d' % i, city='City %d' % (i % 7), state='CA', address='%d Main St' % i,
+            phone='555-000-%04d' % i, date_added=datetime.datetime.utcnow()
+        ))
+    db.session.commit()
+
+
+def test_venue_areas_query_count_does_not_grow_with_venues(run_queries):
+    add_venues(3)
+    response, few = run_queries('/venues')
+    assert response.status_code == 200
+
+    add_venues(40, start=3)
+    response, many = run_queries('/venues')
+    assert response.status_code == 200
+    assert b'Venue 42' in response.data
+    assert len(many) == len(few) <= 2
+
+
+def test_delete_venue_removes_its_shows_and_genres(app, client):
+    add_venues(1)
+    venue = Venue.query.one()
+    venue.genres = ['Jazz', 'Blues']
+    artist = Artist(name='Artist', phone='555-111-0000', date_added=datetime.datetime.utcnow())
+    db.session.add(artist)
+    db.session.flush()
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.datetime.now() + datetime.timedelta(days=7)))
+    db.session.commit()
+    venue_id, artist_id = venue.id, artist.id
+    assert db.session.get(Artist, artist_id).upcoming_shows_count == 1
+    db.session.remove()
+    assert b'Venue 0' in client.get('/artists/%d' % artist_id).data
+
+    response = client.delete('/venues/%d' % venue_id)
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert [message for _, message in session['_flashes']] == ['Venue was successfully deleted!']
+
+    assert db.session.get(Venue, venue_id) is None
+    assert Show.query.count() == 0
+    assert VenueGenre.query.count() == 0
+    assert db.session.get(Artist, artist_id).upcoming_shows_count == 0
+    assert b'Venue 0' not in client.get('/artists/%d' % artist_id).data
+    assert client.delete('/venues/%d' % venue_id).status_code == 404
+
+
+def test_search_index_follows_venue_writes(client, run_queries):
+    response = client.post('/venues/create', data={
+        'name': 'Blue Moon Hall', 'city': 'Springfield', 'state': 'IL', 'address': '1 Main St',
+        'phone': '555-222-0000', 'genres': ['Jazz']
+    })
+    assert response.status_code == 302
+    venue_id = Venue.query.filter_by(name='Blue Moon Hall').one().id
+    db.session.remove()
+
+    response, statements = run_queries('/venues/search', method='POST', data={'search_term': 'moon'})
+    assert b'Blue Moon Hall' in response.data
+    assert not [statement for statement in statements if statement.lstrip().upper().startswith('CREATE')]
+
+    client.delete('/venues/%d' % venue_id)
+    link = b'href="/venues/%d"' % venue_id
+    assert link not in client.post('/venues/search', data={'search_term': 'moon'}).data
+
+
+def test_cached_venue_page_follows_its_etag(client):
+    add_venues(1)
+    artist = Artist(name='Artist', phone='555-111-0000', date_added=datetime.datetime.utcnow())
+    db.session.add(artist)
+    db.session.flush()
+    db.session.add(Show(venue_id=1, artist_id=artist.id, start_time=datetime.datetime.now() + datetime.timedelta(days=1)))
+    db.session.commit()
+
+    first = client.get('/venues/1')
+    assert b'1 Upcoming Show<' in first.data
+    assert client.get('/venues/1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/api/v1/venues/1').get_json()['upcoming_shows_count'] == 1
+
+    # The show starts; nothing invalidates the cached page
+    db.session.execute(update(Show).values(start_time=datetime.datetime.now() - datetime.timedelta(hours=1)))
+    db.session.commit()
+
+    second = client.get('/venues/1', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert b'0 Upcoming Shows' in second.data and b'1 Past Show<' in second.data
+    assert client.get('/api/v1/venues/1').get_json()['past_shows_count'] == 1
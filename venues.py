@@ -0,0 +1,216 @@
+import datetime
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from models import db, recount_show_counters, Venue, VenueGenre, Show
+import search
+from views import page_args, conditional
+from queries import venue_areas, venue_detail, venue_artist_ids, venue_validators, VENUE_KEY
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('venues', __name__)
+
+@blueprint.route('/venues')
+def venues():
+  """
+    Returns the georgrphical areas for which we have Venues, optionally
+    filtered to the genres given as repeated ?genre= arguments
+  """
+  page = venue_areas(genres=request.args.getlist('genre'), **page_args(VENUE_KEY))
+
+  return render_template('pages/venues.html', areas=page['items'], page=page)
+
+@blueprint.route('/venues/search', methods=['POST'])
+def search_venues():
+  """
+    Returns Venues matching a given POST search string
+  """
+  venues = search.search_venues(request.form.get('search_term', ''), limit=current_app.config['SEARCH_RESULTS_LIMIT'])
+
+  count = 0
+  match_array = []
+  for venue in venues:
+    count += 1
+    match_array.append({
+      "id": venue.id,
+      "name": venue.name,
+      "num_upcoming_shows": venue.upcoming_shows_count
+    })
+  response = {
+    "count": count,
+    "data": match_array
+  }
+
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@blueprint.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+  """
+  Returns a page showing the database details for the given venue,
+  where the venue ID is supplied as a GET request parameter
+  """
+  validators = venue_validators(venue_id)
+  if validators is None:
+    abort(404)
+
+  def render():
+    cache = current_app.extensions['entity_cache']
+    # Tagged with the ETag so the body sent always matches it
+    data = cache.venue(venue_id, validators[0], lambda: venue_detail(venue_id, past_limit=current_app.config.get('PAST_SHOWS_LIMIT')))
+    if data is None:
+      abort(404)
+    return render_template('pages/show_venue.html', venue=data)
+
+  return conditional(validators, render)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  """
+    Creates a database entry for a new Venue, the details of which are POSTed
+  """
+  from forms import VenueForm
+  form = VenueForm()
+  if form.validate():
+    name = form.name.data
+    city = form.city.data
+    state = form.state.data
+    address = form.address.data
+    phone = form.phone.data
+    image_link = form.image_link.data
+    genres = form.genres.data
+    website_link = form.website_link.data
+    facebook_link = form.facebook_link.data
+    date_added = datetime.datetime.utcnow()
+
+    try:
+      venue = Venue(name=name, city=city, state=state, address=address, phone=phone, image_link=image_link, genres=genres, website_link=website_link, facebook_link=facebook_link, date_added=date_added)
+      db.session.add(venue)
+      db.session.flush()
+      venue_id = venue.id
+      search.index_venue(venue_id)
+      db.session.commit()
+      # SQLite may hand out the ID of a deleted venue again
+      current_app.extensions['entity_cache'].invalidate(venue_ids=[venue_id])
+      flash('Venue ' + form.name.data + ' was successfully listed!')
+      # TODO: insert form data as a new Venue record in the db, instead
+      # TODO: modify data to be the data object returned from db insertion
+    except Exception:
+      db.session.rollback()
+      flash('ERROR: Venue not added')
+    finally:
+      db.session.close()
+  else:
+    flash('ERROR: Venue not added, please check errors below:')
+    return render_template('forms/new_venue.html', form=form)
+
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  return redirect(url_for('index'))
+
+@blueprint.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  """
+  Deletes the given venue, its genres and its shows from the database,
+  the ID is passed in the URL
+  """
+  venue = db.session.get(Venue, venue_id)
+  if venue is None:
+    abort(404)
+  try:
+    # Its artists' pages list the shows deleted with it
+    artist_ids = venue_artist_ids(venue_id)
+    # In one statement each rather than row by row; the artists' show
+    # counters are recounted after. SQLite only cascades the delete to the
+    # genres with foreign keys enabled
+    Show.query.filter(Show.venue_id == venue_id).delete(synchronize_session=False)
+    VenueGenre.query.filter(VenueGenre.venue_id == venue_id).delete(synchronize_session=False)
+    recount_show_counters(artist_ids=artist_ids)
+    db.session.delete(venue)
+    search.unindex_venue(venue_id)
+    db.session.commit()
+    current_app.extensions['entity_cache'].invalidate(venue_ids=[venue_id], artist_ids=artist_ids)
+    flash('Venue was successfully deleted!')
+  except Exception as e:
+    db.session.rollback()
+    flash("Error deleting venue: " + str(e))
+  finally:
+    db.session.close()
+
+  return redirect(url_for('index'))
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  """
+  Deliver a page showing the database details of the venue given as a GET parameter id.
+  Allows users to edit and submit changes
+  """
+  from forms import VenueForm
+  venue = Venue.query.get(venue_id)
+  form = VenueForm(obj=venue)
+  form.genres.data = venue.genres
+
+  # TODO: populate form with values from venue with ID <venue_id>
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  """
+  Receives data from the edit venue page and stores changes in the database.
+  Venue ID is provided as a GET parameter and the form data is POSTed
+  """
+  from forms import VenueForm
+  form = VenueForm()
+  # if form.validate_on_submit():
+  name = form.name.data
+  city = form.city.data
+  state = form.state.data
+  address = form.address.data
+  phone = form.phone.data
+  image_link = form.image_link.data
+  genres = form.genres.data
+  website_link = form.website_link.data
+  facebook_link = form.facebook_link.data
+
+  try:
+    venue = Venue.query.get(venue_id)
+    venue.name = name
+    venue.city = city
+    venue.state = state
+    venue.address = address
+    venue.phone = phone
+    venue.image_link = image_link
+    venue.facebook_link = facebook_link
+    venue.website_link = website_link
+    venue.genres = genres
+    db.session.flush()
+    search.index_venue(venue_id)
+
+    db.session.commit()
+    # The venue's name and image also appear on its artists' pages
+    current_app.extensions['entity_cache'].invalidate(venue_ids=[venue_id], artist_ids=venue_artist_ids(venue_id))
+    flash('Venue ' + form.name.data + ' was successfully updated!')
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+  except Exception:
+    db.session.rollback()
+    flash('ERROR: Venue not updated')
+  finally:
+    db.session.close()
+
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  return redirect(url_for('.show_venue', venue_id=venue_id))
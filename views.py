@@ -0,0 +1,76 @@
+from urllib.parse import urlencode
+from flask import Response, abort, current_app, get_flashed_messages, make_response, request, session, stream_template, url_for
+from werkzeug.http import is_resource_modified
+from compression import streamed_response
+from queries import decode_cursor
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+def page_args(key_types):
+  """
+    Reads the keyset pagination cursors of the current request, aborting
+    with a 400 if either one is malformed
+  """
+  after = request.args.get('after')
+  before = request.args.get('before')
+  try:
+    return {
+      'after': decode_cursor(after, key_types) if after else None,
+      'before': decode_cursor(before, key_types) if before else None,
+      'per_page': current_app.config['LISTING_PAGE_SIZE']
+    }
+  except ValueError:
+    abort(400)
+
+def page_url(direction, cursor):
+  """
+    Returns the URL of the current page with its cursor replaced, keeping
+    any other query string arguments
+  """
+  args = request.args.copy()
+  args.pop('after', None)
+  args.pop('before', None)
+  args[direction] = cursor
+  return url_for(request.endpoint, **request.view_args) + '?' + urlencode(list(args.items(multi=True)))
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def conditional(validators, render):
+  """
+    Answers with a 304 if the client's copy matches the (etag, last_modified)
+    validators, otherwise calls render() and tags its response with them.
+    Pages with pending flash messages are always rendered so the messages
+    are shown
+  """
+  etag, last_modified = validators
+  if '_flashes' not in session and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+    response = Response(status=304)
+  else:
+    response = make_response(render())
+  # Whether a streamed page is compressed depends on the client and on the
+  # page's size, and a 304 has to carry the tag and Vary the 200 would
+  # without rendering it, so the tag is always weak and always varies
+  response.set_etag(etag, weak=True)
+  response.vary.add('Accept-Encoding')
+  response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  return response
+
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+
+def stream_page(template_name, **context):
+  """
+    Returns a response that renders the template as it is sent, compressed
+    when the client accepts it (see compression.py), for pages long
+    enough that the browser should not wait for the whole of them
+  """
+  # The session cookie is written before the body; taking the flashes out
+  # of it now keeps them from being shown again on the next page
+  get_flashed_messages()
+  return streamed_response(stream_template(template_name, **context))